@@ -0,0 +1,159 @@
+"""行处理微基准：只测 PDF 取出文本之后、按行做的那几步纯 Python 处理，不含 PyMuPDF。
+
+阶段：
+  pdf_lines      iter_pdf_lines（跨页拼接、去全部空白、去空行）
+  paragraphs     iter_litigation_paragraphs（过滤页码行、按 <PARA> 规则分段）
+  trial_result   special_segment_trial_result（序号前补换行、按汉字数加 <PARA>）
+  judge_info     审判人员段落中汉字间空白的清理
+
+每个阶段与改写前的逐行实现（本文件中的 reference_*）对比：先校验两者输出完全相同，
+再各自重复 --repeat 次取最快一次，报告行/秒和加速比。输入是合成语料 PDF 的逐页文本，
+外加一组边界用例（各种 Unicode 空白、跨页半行、全角数字页码、行内 <PARA> 等）。
+
+    python benchmarks/bench_lines.py --pages 20 200 --docs 10
+"""
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import judgment_core as core  # noqa: E402
+from corpus import generate_corpus  # noqa: E402
+
+# 覆盖各种空白、换行符和分段规则的边界用例（逐页文本）
+EDGE_PAGES = [
+    "  民事判决书 \n（2023）京01民终1号　\n上诉人：张某，男。\r\n被上诉人： 李某 公司\n",
+    "1/12\n１/１２\n12 / 3\n本院认为，双方签订的合同合法有效。\n半行跨页",
+    "接上页\x0b竖制表\x0c换页\x1c文件分隔\x85下一行 行分隔 段分隔\n",
+    "行内<PARA>标记<PARA>\n<PARA>\n\t \n短行\n" + "很长的一行没有句号" * 6 + "\n" + "四十字以内以句号结尾的行。" * 2 + "\n",
+    "",
+    "末尾没有换行\r",
+    "\n紧跟上一页的回车",
+]
+EDGE_TRIAL_RESULTS = [
+    "一、驳回上诉，维持原判。二、案件受理费100元，由上诉人负担。\n十一、本判决为终审判决。",
+    "判决如下：\n" + "上诉人应于本判决生效之日起十日内向被上诉人支付货款及利息" * 2 + "\n三、其他。",
+    "",
+]
+EDGE_JUDGE_INFOS = [
+    "审 判 长  张  三\n审 判 员　李四\n书 记 员\t王 五\n二〇二三年 一月",
+    "审判长 A 张三\n\n人民 陪审员 赵 六 ",
+]
+
+_REF_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def reference_pdf_lines(page_texts):
+    carry = ""
+    for text in page_texts:
+        if carry:
+            text = carry + text
+            carry = ""
+        lines = text.splitlines(True)
+        if lines and lines[-1].splitlines()[0] == lines[-1]:
+            carry = lines.pop()
+        for line in lines:
+            line = line.strip()
+            if line:
+                yield _REF_WHITESPACE_RE.sub('', line)
+    carry = carry.strip()
+    if carry:
+        yield _REF_WHITESPACE_RE.sub('', carry)
+
+
+def reference_paragraphs(lines):
+    kept = [line for line in lines if not re.match(r'^\d+/\d+$', line)]
+    return [p.strip() for p in ''.join(core.add_para_tags(kept)).split('<PARA>') if p.strip()]
+
+
+def reference_trial_result(text):
+    text = re.sub(r'(?<!\n)(?=[一二三四五六七八九十]+、)', r'\n', text)
+    new_lines = []
+    for line in text.split('\n'):
+        if len(re.findall(r'[一-龥]', line)) <= 35:
+            new_lines.append(line + "<PARA>")
+        else:
+            new_lines.append(line)
+    return "\n".join(new_lines)
+
+
+def reference_judge_info(judge_info):
+    lines = [re.sub(r'([一-龥])\s+([一-龥])', r'\1\2', line) for line in judge_info.split('\n')]
+    return '\n'.join(lines).strip()
+
+
+def current_judge_info(judge_info):
+    return core._HANZI_GAP_RE.sub(r'\1\2', judge_info).strip()
+
+
+def load_inputs(pages_list, docs, corpus_dir, seed):
+    """返回 (各篇逐页文本, 裁判结果片段, 审判人员片段)"""
+    documents = list(EDGE_PAGES[i:i + 3] for i in range(len(EDGE_PAGES)))
+    for pages in pages_list:
+        files = generate_corpus(os.path.join(corpus_dir, f"p{pages}-n{docs}-s{seed}"), docs, pages, seed,
+                                kinds=("pdf",))
+        documents.extend(list(core.iter_pdf_page_texts(path)) for path in files)
+    trial_results, judge_infos = list(EDGE_TRIAL_RESULTS), list(EDGE_JUDGE_INFOS)
+    for page_texts in documents:
+        full_text = "\n".join(page_texts)
+        # 合成语料里没有现成的裁判结果/审判人员段落，取正文片段代替，规模相当
+        trial_results.append(full_text[-2000:])
+        judge_infos.append(full_text[-300:])
+    return documents, trial_results, judge_infos
+
+
+def best_of(repeat, func, inputs):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in inputs:
+            func(item)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PDF 行处理微基准（与改写前的实现对比）")
+    parser.add_argument("--pages", type=int, nargs="+", default=[20, 200], help="每篇页数，可给多个（默认：20 200）")
+    parser.add_argument("--docs", type=int, default=10, help="每种页数生成的 PDF 篇数（默认：%(default)s）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5, help="每个实现重复次数，取最快一次（默认：%(default)s）")
+    parser.add_argument("--corpus-dir", default=os.path.join(tempfile.gettempdir(), "judgment-bench-corpus"),
+                        help="合成语料缓存目录，已生成的文件会复用（默认：%(default)s）")
+    args = parser.parse_args(argv)
+
+    documents, trial_results, judge_infos = load_inputs(args.pages, args.docs, args.corpus_dir, args.seed)
+    line_lists = [list(core.iter_pdf_lines(page_texts)) for page_texts in documents]
+    stages = [
+        ("pdf_lines", documents, lambda texts: list(reference_pdf_lines(texts)),
+         lambda texts: list(core.iter_pdf_lines(texts))),
+        ("paragraphs", line_lists, reference_paragraphs,
+         lambda lines: list(core.iter_litigation_paragraphs(lines))),
+        ("trial_result", trial_results, reference_trial_result, core.special_segment_trial_result),
+        ("judge_info", judge_infos, reference_judge_info, current_judge_info),
+    ]
+    line_count = sum(map(len, line_lists))
+    print(f"{len(documents)} 篇，{line_count} 行")
+    print(f"{'阶段':<14}{'改写前 ms':>12}{'当前 ms':>12}{'当前 行/秒':>14}{'加速':>8}")
+    mismatches = 0
+    for name, inputs, reference, current in stages:
+        for item in inputs:
+            if reference(item) != current(item):
+                mismatches += 1
+                print(f"  ⚠ {name} 输出不一致：{str(item)[:80]!r}")
+                break
+        old = best_of(args.repeat, reference, inputs)
+        new = best_of(args.repeat, current, inputs)
+        lines = line_count if name in ("pdf_lines", "paragraphs") else sum(s.count("\n") + 1 for s in inputs)
+        print(f"{name:<14}{old * 1000:>12.2f}{new * 1000:>12.2f}{lines / new if new else 0:>14.0f}"
+              f"{old / new if new else 0:>7.2f}×")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""分阶段基准测试：在合成文书上分别计时各个处理阶段。
+
+阶段：
+  docx_load      load_docx（案名、案号、段落）
+  pdf_extract    extract_pdf_text（PyMuPDF 取文本、去空白、分段）
+  parse          parse_fields / extract_text_from_txt
+  render         generate_wechat_html
+  write          写出 HTML 文件
+
+每个阶段报告吞吐量（篇/秒）与 p50/p95 延迟，另报告进程峰值 RSS。结果保存为 JSON，
+用 --compare 指定上一次的结果文件即可对比，变慢超过阈值的阶段会被标出（退出码 1）。
+
+    python benchmarks/bench_pipeline.py --pages 2 20 200 --docs 50 --out bench.json
+    python benchmarks/bench_pipeline.py --pages 2 20 200 --docs 50 --compare bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import judgment_core as core  # noqa: E402
+from corpus import generate_corpus  # noqa: E402
+
+STAGES = ("docx_load", "pdf_extract", "parse", "render", "write")
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    total = sum(samples)
+    return {
+        'n': len(samples),
+        'total_s': total,
+        'throughput': len(samples) / total if total else 0.0,
+        'p50_ms': percentile(samples, 50) * 1000,
+        'p95_ms': percentile(samples, 95) * 1000,
+    }
+
+
+def bench_file(path, out_dir, timings):
+    def timed(stage, func, *args):
+        start = time.perf_counter()
+        value = func(*args)
+        timings[stage].append(time.perf_counter() - start)
+        return value
+
+    if path.endswith(".docx"):
+        judgment = timed("docx_load", core.load_docx, path)
+        data = timed("parse", core.parse_fields, judgment.full_text, judgment.case_name, judgment.case_number)
+    else:
+        lines, full_text = timed("pdf_extract", core.extract_pdf_text, path)
+        data = timed("parse", core.extract_text_from_txt, lines, full_text)
+    html = timed("render", core.generate_wechat_html, data)
+
+    def write():
+        html_path = os.path.join(out_dir, os.path.basename(path) + ".html")
+        with open(html_path, "w", encoding="utf-8") as f:
+            f.write(html)
+    timed("write", write)
+
+
+def run(pages_list, docs, corpus_dir, seed):
+    runs = []
+    with tempfile.TemporaryDirectory() as out_dir:
+        for pages in pages_list:
+            files = generate_corpus(os.path.join(corpus_dir, f"p{pages}-n{docs}-s{seed}"), docs, pages, seed)
+            timings = {stage: [] for stage in STAGES}
+            failures = 0
+            start = time.perf_counter()
+            for path in files:
+                try:
+                    bench_file(path, out_dir, timings)
+                except Exception as e:
+                    failures += 1
+                    print(f"  ❌ {os.path.basename(path)}：{type(e).__name__}: {e}", file=sys.stderr)
+            runs.append({
+                'pages': pages,
+                'docs': docs,
+                'files': len(files),
+                'failures': failures,
+                'wall_s': time.perf_counter() - start,
+                'stages': {stage: summarize(samples) for stage, samples in timings.items() if samples},
+            })
+            print_run(runs[-1])
+    return runs
+
+
+def print_run(run):
+    print(f"\n== {run['pages']} 页 × {run['docs']} 篇（{run['files']} 个文件，失败 {run['failures']}，"
+          f"总用时 {run['wall_s']:.2f}s）")
+    print(f"{'阶段':<12}{'次数':>6}{'篇/秒':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for stage in STAGES:
+        s = run['stages'].get(stage)
+        if s:
+            print(f"{stage:<12}{s['n']:>6}{s['throughput']:>10.1f}{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}")
+
+
+def compare(current, baseline_path, threshold):
+    """按 (页数, 阶段) 对比 p50，慢于基线超过 threshold 的记为回归"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    old_runs = {(r['pages'], r['docs']): r for r in baseline['runs']}
+    regressions = 0
+    print(f"\n== 与 {baseline_path} 对比（p50，阈值 {threshold:.0%}）")
+    for run in current['runs']:
+        old = old_runs.get((run['pages'], run['docs']))
+        if not old:
+            continue
+        for stage in STAGES:
+            new_s, old_s = run['stages'].get(stage), old['stages'].get(stage)
+            if not new_s or not old_s or not old_s['p50_ms']:
+                continue
+            ratio = new_s['p50_ms'] / old_s['p50_ms']
+            flag = ""
+            if ratio > 1 + threshold:
+                flag = "  ⚠ 回归"
+                regressions += 1
+            print(f"{run['pages']:>4} 页 {stage:<12}{old_s['p50_ms']:>10.2f} -> {new_s['p50_ms']:>10.2f} ms"
+                  f"  ×{ratio:.2f}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="裁判文书转换流程分阶段基准测试")
+    parser.add_argument("--pages", type=int, nargs="+", default=[2, 20, 200], help="每篇页数，可给多个（默认：2 20 200）")
+    parser.add_argument("--docs", type=int, default=20, help="每种页数生成的文书篇数（默认：%(default)s）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--corpus-dir", default=os.path.join(tempfile.gettempdir(), "judgment-bench-corpus"),
+                        help="合成语料缓存目录，已生成的文件会复用（默认：%(default)s）")
+    parser.add_argument("--out", help="把结果保存为 JSON")
+    parser.add_argument("--compare", help="与之前保存的 JSON 结果对比")
+    parser.add_argument("--threshold", type=float, default=0.10, help="回归判定阈值（默认：%(default)s）")
+    args = parser.parse_args(argv)
+
+    runs = run(args.pages, args.docs, args.corpus_dir, args.seed)
+    result = {
+        'meta': {
+            'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'parser_version': core.PARSER_VERSION,
+        },
+        'peak_rss_mb': peak_rss_mb(),
+        'runs': runs,
+    }
+    if result['peak_rss_mb'] is not None:
+        print(f"\n峰值 RSS：{result['peak_rss_mb']:.1f} MB")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存：{args.out}")
+    if args.compare:
+        return 1 if compare(result, args.compare, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
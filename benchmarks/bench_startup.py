@@ -0,0 +1,146 @@
+"""启动耗时基准：用 -X importtime 测量各入口冷启动时导入了哪些模块、花了多少时间。
+
+场景：
+  core        import judgment_core（批量、监视、服务子进程都会导入）
+  batch       main02noimage.py batch --help（命令行入口，不应加载 PyQt5）
+  gui         import judgment_gui（界面入口，含 PyQt5）
+  exe         --exe 指定的 PyInstaller 打包程序执行 batch --help（--onefile 每次启动都要解包）
+
+每个场景重复 --runs 次取墙钟时间中位数，并列出累计导入耗时最多的模块。
+core/batch 场景如果导入了 PyMuPDF、python-docx、BeautifulSoup 或 PyQt5 会被标出（退出码 1）。
+结果可保存为 JSON，用 --compare 与上一次对比。
+
+    python benchmarks/bench_startup.py --out startup.json
+    python benchmarks/bench_startup.py --exe dist/main02noimage --compare startup.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 这些模块只应在真正用到时才导入
+HEAVY_MODULES = ("fitz", "pymupdf", "docx", "bs4", "PyQt5")
+
+SCENARIOS = {
+    'core': ([sys.executable, "-X", "importtime", "-c", "import judgment_core"], HEAVY_MODULES),
+    'batch': ([sys.executable, "-X", "importtime", os.path.join(ROOT, "main02noimage.py"), "batch", "--help"],
+              HEAVY_MODULES),
+    'gui': ([sys.executable, "-X", "importtime", "-c", "import judgment_gui"], ()),
+}
+
+
+def parse_importtime(stderr):
+    """解析 -X importtime 输出，返回 (导入总微秒, {模块: 累计微秒})"""
+    total, cumulative = 0, {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, us, name = line[len("import time:"):].split("|", 2)
+        cumulative[name.strip()] = int(us)
+        # 嵌套导入的模块名前有缩进，只有顶层导入计入总时间
+        if name[1:2] != " ":
+            total += int(us)
+    return total, cumulative
+
+
+def run_scenario(cmd, forbidden, runs):
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    walls, imports = [], None
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.run(cmd, cwd=ROOT, env=env, capture_output=True, text=True)
+        walls.append(time.perf_counter() - start)
+        if proc.returncode != 0:
+            raise RuntimeError(f"{' '.join(cmd)} 退出码 {proc.returncode}：{proc.stderr[-500:]}")
+        if imports is None:
+            imports = parse_importtime(proc.stderr)
+    total, cumulative = imports
+    loaded = sorted(m for m in cumulative if m.split(".")[0] in forbidden)
+    slowest = sorted(cumulative.items(), key=lambda item: item[1], reverse=True)[:10]
+    return {
+        'wall_ms': statistics.median(walls) * 1000,
+        'wall_min_ms': min(walls) * 1000,
+        'import_ms': total / 1000,
+        'modules': len(cumulative),
+        'slowest': [{'module': m, 'cumulative_ms': us / 1000} for m, us in slowest],
+        'forbidden_loaded': loaded,
+    }
+
+
+def print_scenario(name, result):
+    print(f"\n== {name}：墙钟 {result['wall_ms']:.0f} ms（最快 {result['wall_min_ms']:.0f} ms），"
+          f"导入 {result['import_ms']:.0f} ms，共 {result['modules']} 个模块")
+    for item in result['slowest']:
+        print(f"  {item['module']:<40}{item['cumulative_ms']:>10.1f} ms")
+    if result['forbidden_loaded']:
+        print(f"  ⚠ 启动时加载了：{', '.join(result['forbidden_loaded'])}")
+
+
+def compare(current, baseline_path, threshold):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = 0
+    print(f"\n== 与 {baseline_path} 对比（墙钟中位数，阈值 {threshold:.0%}）")
+    for name, result in current['scenarios'].items():
+        old = baseline['scenarios'].get(name)
+        if not old or not old['wall_ms']:
+            continue
+        ratio = result['wall_ms'] / old['wall_ms']
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  ⚠ 回归"
+            regressions += 1
+        print(f"{name:<8}{old['wall_ms']:>10.0f} -> {result['wall_ms']:>10.0f} ms  ×{ratio:.2f}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="冷启动耗时基准（-X importtime）")
+    parser.add_argument("--runs", type=int, default=5, help="每个场景重复次数（默认：%(default)s）")
+    parser.add_argument("--exe", help="PyInstaller 打包出的可执行文件，测量其 batch --help 的启动时间")
+    parser.add_argument("--out", help="把结果保存为 JSON")
+    parser.add_argument("--compare", help="与之前保存的 JSON 结果对比")
+    parser.add_argument("--threshold", type=float, default=0.20, help="回归判定阈值（默认：%(default)s）")
+    args = parser.parse_args(argv)
+
+    scenarios = {}
+    for name, (cmd, forbidden) in SCENARIOS.items():
+        scenarios[name] = run_scenario(cmd, forbidden, args.runs)
+        print_scenario(name, scenarios[name])
+    if args.exe:
+        # 打包程序不接受 -X importtime，只测墙钟时间
+        walls = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            subprocess.run([args.exe, "batch", "--help"], capture_output=True, check=True)
+            walls.append(time.perf_counter() - start)
+        scenarios['exe'] = {'wall_ms': statistics.median(walls) * 1000, 'wall_min_ms': min(walls) * 1000}
+        print(f"\n== exe：墙钟 {scenarios['exe']['wall_ms']:.0f} ms（最快 {scenarios['exe']['wall_min_ms']:.0f} ms）")
+
+    result = {
+        'meta': {
+            'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+        },
+        'scenarios': scenarios,
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存：{args.out}")
+    failed = any(s.get('forbidden_loaded') for s in scenarios.values())
+    if args.compare:
+        failed = compare(result, args.compare, args.threshold) or failed
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""离线生成合成裁判文书（DOCX/PDF），用于基准测试。
+
+版式模仿威科先行导出的文书：标题、审理法院、案号、当事人、审理经过、本院查明、
+本院认为、判决如下：、裁判结果、审判人员，与 judgment_core 中解析器依赖的结构一致。
+同一 seed 生成的内容完全相同，便于不同版本之间对比。
+
+    python benchmarks/corpus.py <输出目录> --docs 100 --pages 20
+"""
+
+import argparse
+import os
+import random
+
+from docx import Document
+import fitz  # PyMuPDF
+
+# PDF 每页行数、每行字数，与真实导出文书大致相当
+PDF_LINES_PER_PAGE = 40
+PDF_CHARS_PER_LINE = 38
+CHARS_PER_PAGE = PDF_LINES_PER_PAGE * PDF_CHARS_PER_LINE
+
+SURNAMES = "赵钱孙李周吴郑王冯陈褚卫蒋沈韩杨朱秦尤许何吕施张孔曹严华金魏陶姜"
+COMPANIES = ["建设工程有限公司", "商贸有限公司", "科技发展有限公司", "物业管理有限公司", "房地产开发有限公司"]
+CAUSES = ["买卖合同纠纷", "建设工程施工合同纠纷", "民间借贷纠纷", "房屋租赁合同纠纷", "劳动争议"]
+COURTS = ["北京市第一中级人民法院", "上海市第二中级人民法院", "广东省高级人民法院", "浙江省杭州市中级人民法院"]
+FACTS = [
+    "双方于{y}年{m}月{d}日签订《{c}》，约定由{a}向{b}供应货物，货款按月结算。",
+    "合同履行过程中，{b}累计支付货款{n}元，尚欠{k}元未予支付。",
+    "{a}多次通过电话、微信及书面函件向{b}催要欠款，{b}均以资金紧张为由拒绝付款。",
+    "经对账，双方确认截至{y}年{m}月{d}日的未付款项金额，{b}在对账单上盖章确认。",
+    "一审庭审中，{b}辩称货物存在质量问题，但未能提交相应证据予以证明。",
+    "上述事实，有合同、送货单、对账单、转账记录及当事人陈述等证据在案佐证。",
+]
+REASONS = [
+    "依法成立的合同，对当事人具有法律约束力，当事人应当按照约定全面履行自己的义务。",
+    "{b}主张货物存在质量瑕疵，但未在合理期限内提出异议，亦未提交证据证明，本院不予采信。",
+    "当事人对自己提出的诉讼请求所依据的事实或者反驳对方诉讼请求所依据的事实，应当提供证据加以证明。",
+    "{a}要求{b}支付欠款{k}元及逾期付款利息，事实清楚，证据充分，本院予以支持。",
+    "关于利息的计算标准，一审法院参照全国银行间同业拆借中心公布的贷款市场报价利率计算，并无不当。",
+    "综上，{b}的上诉请求不能成立，应予驳回；一审判决认定事实清楚，适用法律正确，应予维持。",
+]
+
+
+def _party(rng):
+    if rng.random() < 0.5:
+        return rng.choice(SURNAMES) + "某"
+    return rng.choice(["北京", "上海", "广州", "杭州"]) + rng.choice(SURNAMES) + "氏" + rng.choice(COMPANIES)
+
+
+def _fill(template, rng, ctx):
+    return template.format(
+        y=rng.randint(2015, 2023), m=rng.randint(1, 12), d=rng.randint(1, 28),
+        n=rng.randint(10000, 9999999), **ctx
+    )
+
+
+def build_judgment(rng, pages=2):
+    """生成一篇文书，返回 (title, case_number, blocks)。
+    blocks 为 (kind, text) 列表，kind 为 'heading' 或 'para'；正文总长约为 pages 页。"""
+    kind = rng.choice(["民事", "民事", "行政"])
+    court = rng.choice(COURTS)
+    cause = rng.choice(CAUSES)
+    a, b = _party(rng), _party(rng)
+    case_number = f"（{rng.randint(2018, 2024)}）{court[:2]}{rng.randint(1, 9):02d}{kind[0]}终{rng.randint(1, 9999)}号"
+    title = f"{a}与{b}{cause}二审{kind}判决书"
+    ctx = {'a': a, 'b': b, 'c': cause.replace("纠纷", ""), 'k': rng.randint(10000, 999999)}
+
+    blocks = [
+        ('heading', title),
+        ('para', f"审理法院：{court}"),
+        ('para', f"案号：{case_number}"),
+        ('heading', "当事人"),
+        ('para', f"上诉人（原审被告）：{b}，住所地{rng.choice(['北京市朝阳区', '上海市浦东新区', '广州市天河区'])}。"),
+        ('para', f"被上诉人（原审原告）：{a}，住所地{rng.choice(['北京市海淀区', '杭州市西湖区', '深圳市南山区'])}。"),
+        ('heading', "审理经过"),
+        ('para', f"上诉人{b}因与被上诉人{a}{cause}一案，不服一审判决，向本院提起上诉。"
+                 f"本院立案后，依法组成合议庭审理了本案。本案现已审理终结。"),
+        ('heading', "本院查明"),
+    ]
+    # 事实与说理大致按 3:2 分配篇幅；段落末行通常排不满，按 85% 折算每页字数
+    budget = max(int(pages * CHARS_PER_PAGE * 0.85) - 1200, 400)
+    used = 0
+    while used < budget * 0.6:
+        para = "".join(_fill(rng.choice(FACTS), rng, ctx) for _ in range(rng.randint(1, 4)))
+        blocks.append(('para', para))
+        used += len(para)
+    blocks.append(('heading', "本院认为"))
+    first = True
+    while used < budget:
+        para = "".join(_fill(rng.choice(REASONS), rng, ctx) for _ in range(rng.randint(1, 4)))
+        blocks.append(('para', ("本院认为，" if first else "") + para))
+        first = False
+        used += len(para)
+    blocks += [
+        ('para', "依照《中华人民共和国民事诉讼法》第一百七十七条第一款第一项规定，判决如下："),
+        ('heading', "裁判结果"),
+        ('para', "一、驳回上诉，维持原判；"),
+        ('para', f"二、二审案件受理费{rng.randint(100, 99999)}元，由上诉人{b}负担。"),
+        ('para', "本判决为终审判决。"),
+        ('heading', "审判人员"),
+        ('para', f"审判长{rng.choice(SURNAMES)}某某"),
+        ('para', f"审判员{rng.choice(SURNAMES)}某"),
+        ('para', f"审判员{rng.choice(SURNAMES)}某某"),
+        ('para', f"二〇{rng.choice(['二一', '二二', '二三'])}年{rng.randint(1, 12)}月{rng.randint(1, 28)}日"),
+        ('para', f"书记员{rng.choice(SURNAMES)}某"),
+    ]
+    return title, case_number, blocks
+
+
+def write_docx(path, title, case_number, blocks):
+    # DOCX 版式：标题分两段、第三段为案号（get_case_name/get_case_number 按段落位置读取）
+    doc = Document()
+    half = len(title) // 2
+    doc.add_paragraph(title[:half])
+    doc.add_paragraph(title[half:])
+    doc.add_paragraph(case_number)
+    for kind, text in blocks[3:]:
+        doc.add_paragraph(text)
+        if kind == 'heading':
+            doc.add_paragraph("")
+    doc.save(path)
+
+
+def write_pdf(path, blocks):
+    lines = []
+    for _, text in blocks:
+        lines.extend(text[i:i + PDF_CHARS_PER_LINE] for i in range(0, len(text), PDF_CHARS_PER_LINE))
+    pages = [lines[i:i + PDF_LINES_PER_PAGE] for i in range(0, len(lines), PDF_LINES_PER_PAGE)]
+    doc = fitz.open()
+    for number, page_lines in enumerate(pages, 1):
+        page = doc.new_page()
+        page.insert_text((40, 40), "\n".join(page_lines), fontname="china-s", fontsize=10)
+        # 页脚页码，解析时按 ^\d+/\d+$ 过滤
+        page.insert_text((280, 820), f"{number}/{len(pages)}", fontname="helv", fontsize=9)
+    doc.save(path)
+    doc.close()
+
+
+def generate_corpus(output_dir, docs=10, pages=2, seed=0, kinds=("docx", "pdf")):
+    """在 output_dir 下生成 docs 篇文书（每篇各一份 DOCX/PDF），返回生成的文件路径列表。
+    已存在的文件直接复用。"""
+    os.makedirs(output_dir, exist_ok=True)
+    rng = random.Random(f"{seed}-{pages}")
+    paths = []
+    for i in range(docs):
+        title, case_number, blocks = build_judgment(rng, pages)
+        for kind in kinds:
+            path = os.path.join(output_dir, f"judgment-p{pages}-{i:05d}.{kind}")
+            if not os.path.exists(path):
+                if kind == "docx":
+                    write_docx(path, title, case_number, blocks)
+                else:
+                    write_pdf(path, blocks)
+            paths.append(path)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="生成合成裁判文书语料")
+    parser.add_argument("output", help="输出目录")
+    parser.add_argument("--docs", type=int, default=10, help="文书篇数（默认：%(default)s）")
+    parser.add_argument("--pages", type=int, default=2, help="每篇大约页数（默认：%(default)s）")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    paths = generate_corpus(args.output, args.docs, args.pages, args.seed)
+    print(f"已生成 {len(paths)} 个文件：{args.output}")
+
+
+if __name__ == "__main__":
+    main()
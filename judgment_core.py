@@ -0,0 +1,2458 @@
+"""裁判文书解析与公众号 HTML 排版的核心逻辑，不依赖 PyQt5。
+
+python-docx、PyMuPDF 都在第一次用到时才导入：
+处理 DOCX 的流程不会加载 PyMuPDF，只处理 PDF 的批次也不会加载 python-docx。
+"""
+
+import sys
+import os
+import traceback
+import re
+import time
+import zipfile
+import io
+import base64
+import functools
+import itertools
+import hashlib
+import json
+import sqlite3
+import logging
+import contextlib
+import posixpath
+import struct
+import zlib
+import signal
+import threading
+import _thread
+import multiprocessing
+from collections import defaultdict, Counter
+from bisect import bisect_left
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+if getattr(sys, 'frozen', False):
+    base_path = os.path.dirname(sys.executable)
+else:
+    base_path = os.path.dirname(os.path.abspath(__file__))
+
+SUPPORTED_EXTS = (".docx", ".pdf")
+
+logger = logging.getLogger("main02noimage")
+
+# ---------------- 文书处理函数 ----------------
+
+# --------- DOCX 读取：一次流式解析，供案名、案号、正文共用 ---------
+
+_W_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+_W_BODY = _W_NS + 'body'
+_W_P = _W_NS + 'p'
+_W_R = _W_NS + 'r'
+_W_HYPERLINK = _W_NS + 'hyperlink'
+_W_TYPE = _W_NS + 'type'
+_W_T = _W_NS + 't'
+# 与 python-docx 的 Run.text 保持一致的行内元素文本映射（w:br 单独按类型处理）
+_W_RUN_CHARS = {
+    _W_NS + 'tab': '\t',
+    _W_NS + 'ptab': '\t',
+    _W_NS + 'cr': '\n',
+    _W_NS + 'noBreakHyphen': '-',
+}
+_W_BR = _W_NS + 'br'
+
+
+def _run_child_text(elem):
+    tag = elem.tag
+    if tag == _W_T:
+        return elem.text or ''
+    if tag == _W_BR:
+        return '\n' if elem.get(_W_TYPE, 'textWrapping') == 'textWrapping' else ''
+    return _W_RUN_CHARS.get(tag, '')
+
+
+def iter_docx_paragraphs(source):
+    """直接从压缩包流式读取 word/document.xml，按顺序产出正文段落文本。
+    与 python-docx 的 doc.paragraphs / paragraph.text 结果一致（只取 body 下的段落，
+    包含超链接内的文字），但不构建整棵 DOM，处理过的节点随即释放。"""
+    with zipfile.ZipFile(source) as zf:
+        with zf.open('word/document.xml') as fh:
+            tags = []
+            body = None
+            parts = None
+            for event, elem in ET.iterparse(fh, events=('start', 'end')):
+                if event == 'start':
+                    tags.append(elem.tag)
+                    if len(tags) == 2 and elem.tag == _W_BODY:
+                        body = elem
+                    elif len(tags) == 3 and elem.tag == _W_P and body is not None:
+                        parts = []
+                    continue
+
+                tags.pop()
+                depth = len(tags)
+                if parts is not None and depth >= 4:
+                    # 结构为 body/p/r/* 或 body/p/hyperlink/r/*
+                    if tags[-1] == _W_R and (depth == 4 or (depth == 5 and tags[3] == _W_HYPERLINK)):
+                        text = _run_child_text(elem)
+                        if text:
+                            parts.append(text)
+                elif depth == 2 and body is not None:
+                    if parts is not None and elem.tag == _W_P:
+                        yield ''.join(parts)
+                        parts = None
+                    # body 的直接子节点处理完即丢弃，内存不随文档长度增长
+                    body.clear()
+
+
+class DocxJudgment:
+    """DOCX 文书只解析一次：案名、案号和正文段落都来自同一遍段落流"""
+
+    def __init__(self, paragraphs):
+        self.head = []   # 前三段原始文本（含空段），案名、案号按段落位置取
+        self.texts = []  # 去掉首尾空白后的非空段落
+        for text in paragraphs:
+            if len(self.head) < 3:
+                self.head.append(text)
+            stripped = text.strip()
+            if stripped:
+                self.texts.append(stripped)
+
+    @property
+    def case_name(self):
+        clean_paras = []
+        for p in self.head[:2]:
+            text = p.strip()
+            if text:
+                text_no_space = re.sub(r'\s+', '', text)
+                cleaned = re.sub(r'[^\w\u4e00-\u9fa5，。！？、：；（）《》“”‘’—\-\.]', '', text_no_space)
+                clean_paras.append(cleaned)
+        case_name = ''.join(clean_paras)
+        return case_name if case_name else "未知案件名称"
+
+    @property
+    def case_number(self):
+        if len(self.head) >= 3:
+            case_number = self.head[2].strip()
+            return case_number if case_number else "未知案号"
+        else:
+            return "未知案号"
+
+    @property
+    def full_text(self):
+        return "\n".join(self.texts)
+
+
+def load_docx(source):
+    """读取 DOCX（路径或文件对象），优先走流式 XML 快速通道"""
+    try:
+        return DocxJudgment(iter_docx_paragraphs(source))
+    except (KeyError, ET.ParseError):
+        # 主文档不叫 word/document.xml 等非常规结构，回退到 python-docx
+        from docx import Document
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        return DocxJudgment(p.text for p in Document(source).paragraphs)
+
+
+def read_docx_full_text(docx_path):
+    return load_docx(docx_path).full_text
+
+def get_case_name_from_docx(docx_path):
+    return load_docx(docx_path).case_name
+
+
+def get_case_number_from_docx(docx_path):
+    return load_docx(docx_path).case_number
+
+def extract_text_from_docx(file_path):
+    return load_docx(file_path).texts
+
+# --------- 文书结构分段：一遍扫描定位全部段落标记 ---------
+
+_PROCESS_MARKERS = ("审理终结", "审查终结", "审理了本案")
+_PROCESS_END_MARKERS = ("审理终结。", "审查终结。")
+_ANALYSIS_MARKERS = ("本院认为", "本院经审查认为", "本院再审认为")
+_RESULT_MARKERS = ("判决如下：", "裁定如下：")
+_JUDGE_MARKERS = ("审判长", "审 判 长")
+_SECTION_MARKERS = (
+    ("审理经过", "裁判结果", "审判人员")
+    + _PROCESS_MARKERS + _PROCESS_END_MARKERS + _ANALYSIS_MARKERS + _RESULT_MARKERS + _JUDGE_MARKERS
+)
+# 长的标记排在前面，同一位置总是匹配到最长的那个；任一标记都不会从另一个标记的中间开始，
+# 所以不重叠的 finditer 不会漏掉位置。较短的前缀标记（如“审理终结”之于“审理终结。”）
+# 通过 _MARKER_PREFIXES 一并记录。
+_SECTION_RE = re.compile('|'.join(re.escape(m) for m in sorted(_SECTION_MARKERS, key=len, reverse=True)))
+_MARKER_PREFIXES = {
+    token: tuple(m for m in _SECTION_MARKERS if token.startswith(m)) for token in _SECTION_MARKERS
+}
+
+
+class SectionIndex:
+    """对全文做一遍线性扫描，记下每个段落标记的所有出现位置，
+    之后的定位都是对位置表二分查找，不再反复扫描全文"""
+
+    def __init__(self, text):
+        self.length = len(text)
+        self.offsets = {marker: [] for marker in _SECTION_MARKERS}
+        for m in _SECTION_RE.finditer(text):
+            pos = m.start()
+            for marker in _MARKER_PREFIXES[m.group()]:
+                self.offsets[marker].append(pos)
+
+    def find(self, marker, start=0):
+        """与 text.find(marker, start) 结果相同（包括负数 start 的含义）"""
+        if start < 0:
+            start = max(start + self.length, 0)
+        positions = self.offsets[marker]
+        i = bisect_left(positions, start)
+        return positions[i] if i < len(positions) else -1
+
+    def find_first(self, markers, start=0):
+        """在 start 之后最早出现的标记，返回 (位置, 标记)，都没有时返回 (-1, None)"""
+        best, best_marker = -1, None
+        for marker in markers:
+            pos = self.find(marker, start)
+            if pos != -1 and (best == -1 or pos < best):
+                best, best_marker = pos, marker
+        return best, best_marker
+
+
+def parse_fields(text, case_name, case_number):
+    index = SectionIndex(text)
+
+    # 诉讼记录：第一个含“审理终结/审查终结/审理了本案”的整行
+    pos, _ = index.find_first(_PROCESS_MARKERS)
+    if pos != -1:
+        line_start = text.rfind('\n', 0, pos) + 1
+        line_end = text.find('\n', pos)
+        process_line = text[line_start:line_end if line_end != -1 else len(text)]
+        litigation_process = process_line.strip()
+
+        # 当事人：最后一次出现案号之后、诉讼记录行之前
+        cut = text.rfind(case_number)
+        party_text = text[cut + len(case_number):] if cut != -1 else text
+        cut = party_text.find(process_line)
+        if cut != -1:
+            party_text = party_text[:cut]
+    else:
+        litigation_process = "诉讼记录缺失"
+        party_text = ""
+    party_lines = [line.strip() for line in party_text.split('\n') if any(k in line for k in ['原告', '被告', '上诉人', '被上诉人', '再审申请人', '被申请人']) and line.strip()]
+    parties_info = '\n'.join(party_lines) if party_lines else "当事人信息缺失"
+
+    # 案件基本情况：“审理终结。/审查终结。”之后到“本院认为”类标记之前
+    case_info = "案件基本情况缺失"
+    pos, marker = index.find_first(_PROCESS_END_MARKERS)
+    if pos != -1:
+        start = pos + len(marker)
+        end, _ = index.find_first(_ANALYSIS_MARKERS, start)
+        if end != -1:
+            case_info = text[start:end].strip()
+
+    # 裁判分析过程：“本院认为”类标记起，到“判决如下：/裁定如下：”为止（含）
+    trial_analysis = "裁判分析过程缺失"
+    pos, marker = index.find_first(_ANALYSIS_MARKERS)
+    if pos != -1:
+        end, end_marker = index.find_first(_RESULT_MARKERS, pos + len(marker))
+        if end != -1:
+            trial_analysis = text[pos:end + len(end_marker)].strip()
+
+    # 裁判结果：“判决如下：/裁定如下：”之后到“审判长”之前
+    trial_result = "裁判结果缺失"
+    pos, marker = index.find_first(_RESULT_MARKERS)
+    if pos != -1:
+        start = pos + len(marker)
+        end, _ = index.find_first(_JUDGE_MARKERS, start)
+        if end != -1:
+            trial_result = text[start:end].strip()
+
+    # 审判人员：第一个“审判长”起到全文结束
+    pos, _ = index.find_first(_JUDGE_MARKERS)
+    judge_info = text[pos:].strip() if pos != -1 else "人员信息缺失"
+
+    # 返回所有提取字段
+    return {
+        'case_name': case_name,
+        'case_number': case_number,
+        'litigation_process': litigation_process,
+        'parties_info': parties_info,
+        'case_info': case_info,
+        'trial_analysis': trial_analysis,
+        'trial_result': trial_result,
+        'judge_info': judge_info
+    }
+
+# --------- PDF 特殊提取逻辑 ---------
+
+
+_PAGE_NUM_RE = re.compile(r'^\d+/\d+$')
+# str.splitlines 认作换行的字符：页尾不以其中之一结尾时，最后半行要与下一页开头拼接
+_LINE_BREAKS = ("\n", "\r", "\v", "\f", "\x1c", "\x1d", "\x1e", "\x85", "\u2028", "\u2029")
+_NON_HANZI_RE = re.compile(r'[^\u4e00-\u9fa5]+')
+# 裁判结果中“一、二、……十一、”等序号前补换行（已在行首的不重复加）
+_TRIAL_ITEM_RE = re.compile(r'(?<!\n)(?=[一二三四五六七八九十]+、)')
+# 同一行内两个汉字之间的空白（不跨行）
+_HANZI_GAP_RE = re.compile(r'([\u4e00-\u9fa5])[^\S\n]+([\u4e00-\u9fa5])')
+
+# 页数达到该值的 PDF 按页码区间分片，由多个进程并行取文本；0 表示始终顺序提取
+DEFAULT_PDF_PARALLEL_PAGES = 150
+# 每个分片至少包含的页数，分片太小时进程启动和传输开销抵消并行收益
+PDF_SHARD_MIN_PAGES = 40
+# 本进程分片提取 PDF 时最多用几个进程（批量转换的工作进程由 _init_worker 设置），None 表示 CPU 核数
+_pdf_shard_workers = None
+
+
+def open_pdf(source):
+    """打开 PDF：source 为路径，或整份文件内容（bytes）"""
+    import fitz  # PyMuPDF
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return fitz.open(stream=source, filetype="pdf")
+    return fitz.open(source)
+
+
+def _extract_page_range(args):
+    """分片进程中执行：单独打开 PDF，取出 [start, stop) 页的文本。
+    发起分片的进程已经不在（例如超出预算被终止）时不再继续"""
+    source, start, stop, parent_pid = args
+    doc = open_pdf(source)
+    try:
+        texts = []
+        for number in range(start, stop):
+            if os.getppid() != parent_pid:
+                break
+            texts.append(doc[number].get_text())
+        return texts
+    finally:
+        doc.close()
+
+
+def pdf_shard_budget(jobs):
+    """jobs 个工作进程并行转换时，每个工作进程分片提取 PDF 最多用几个进程：合计不超过 CPU 核数"""
+    cpus = os.cpu_count() or 1
+    return max(1, cpus // (jobs or cpus))
+
+
+def pdf_shard_count(page_count, workers=None):
+    """分片数：不超过 workers（默认为本进程的分片预算，未设置时为 CPU 核数），每片不少于 PDF_SHARD_MIN_PAGES 页"""
+    workers = workers or _pdf_shard_workers or os.cpu_count() or 1
+    return max(1, min(workers, page_count // PDF_SHARD_MIN_PAGES))
+
+
+def iter_sharded_page_texts(source, page_count, shards):
+    """把 PDF 按连续页码区间分成 shards 片交给多个进程提取，按页序逐页产出文本。
+    各页文本与顺序提取完全相同，合并后的结果自然一致。
+    提前结束（包括超出文书预算被中断）时终止全部分片进程。"""
+    bounds = [page_count * i // shards for i in range(shards + 1)]
+    ranges = [(source, start, stop, os.getpid()) for start, stop in zip(bounds[:-1], bounds[1:])]
+    # 退出 with 块时 terminate() 结束分片进程
+    with multiprocessing.Pool(shards) as pool:
+        # imap 按提交顺序返回，前面的分片可以边等后面的分片边处理
+        results = pool.imap(_extract_page_range, ranges)
+        for _ in ranges:
+            while True:
+                try:
+                    # 定时回到 Python 代码，文书预算的中断（DocBudget）才能在等待中生效
+                    texts = results.next(timeout=_BUDGET_POLL_INTERVAL)
+                    break
+                except multiprocessing.TimeoutError:
+                    continue
+            yield from texts
+
+
+def iter_pdf_page_texts(pdf_path, dump_path=None, stats=None, parallel_pages=0):
+    """逐页产出 PDF 文本（pdf_path 也可以是文件内容 bytes）；给出 dump_path 时同时把原始文本
+    写入调试文件，给出 stats 时记录页数。
+    页数达到 parallel_pages（非 0）时改为多进程分片提取，产出的逐页文本不变。"""
+    doc = open_pdf(pdf_path)
+    page_count = doc.page_count
+    if stats is not None:
+        stats['pages'] = page_count
+    shards = pdf_shard_count(page_count) if parallel_pages and page_count >= parallel_pages else 1
+    if shards > 1:
+        doc.close()
+        if stats is not None:
+            stats['pdf_shards'] = shards
+        texts = iter_sharded_page_texts(pdf_path, page_count, shards)
+    else:
+        texts = (page.get_text() for page in doc)
+    dump = open(dump_path, "w", encoding="utf-8") if dump_path else None
+    try:
+        for text in texts:
+            if dump:
+                dump.write(text)
+            yield text
+    finally:
+        if not doc.is_closed:
+            doc.close()
+        if dump:
+            dump.close()
+
+
+def iter_pdf_lines(page_texts):
+    """把逐页文本切成去掉全部空白的非空行。
+    页尾没有换行的半行会与下一页开头拼接，结果与整篇拼接后再 splitlines 一致。
+    去空白用 "".join(line.split())：str.split 的空白判定与 strip()、正则 \\s 相同，
+    一次调用就完成原先 strip() 加 re.sub 两遍扫描的工作。"""
+    join = "".join
+    carry = ""
+    for text in page_texts:
+        if carry:
+            text = carry + text
+        lines = text.splitlines()
+        carry = lines.pop() if lines and not text.endswith(_LINE_BREAKS) else ""
+        yield from filter(None, map(join, map(str.split, lines)))
+    carry = join(carry.split())
+    if carry:
+        yield carry
+
+
+def hanzi_count(text):
+    """text 中基本区汉字（U+4E00–U+9FA5）的个数"""
+    return len(_NON_HANZI_RE.sub('', text))
+
+
+def iter_litigation_paragraphs(lines_no_spaces):
+    """去掉页码行后按 add_para_tags 的规则把行合并成段落，
+    等价于 ''.join(add_para_tags(lines)).split('<PARA>') 再去掉空段，但不生成中间列表。
+    每行只判断一次页码和分段，不含“/”、“<PARA>”的行（绝大多数）不进正则、不切分。"""
+    buf = []
+    for line in lines_no_spaces:
+        if '/' in line and _PAGE_NUM_RE.match(line):
+            continue
+        if '<PARA>' not in line:
+            buf.append(line)
+        else:
+            # 行内本身带 <PARA> 字样时同样作为分段点
+            *done, rest = line.split('<PARA>')
+            for piece in done:
+                buf.append(piece)
+                para = ''.join(buf).strip()
+                buf = []
+                if para:
+                    yield para
+            buf.append(rest)
+        # 同 _ends_paragraph
+        if len(line) < 10 or (len(line) <= 40 and line[-1] == '。'):
+            para = ''.join(buf).strip()
+            buf = []
+            if para:
+                yield para
+    para = ''.join(buf).strip()
+    if para:
+        yield para
+
+
+def extract_pdf_text(pdf_path, dump_path=None, stats=None, parallel_pages=0):
+    """PDF 取文本阶段，返回 (lines_no_spaces, full_text_for_litigation)"""
+    # 去除行内多余空白后的全部行（案名、案号、当事人等按行定位，需要保留为列表）
+    page_texts = iter_pdf_page_texts(pdf_path, dump_path, stats, parallel_pages)
+    lines_no_spaces = list(iter_pdf_lines(page_texts))
+
+    # 过滤页码、按<PARA>规则分段，再用换行连接成带换行的多段文本
+    full_text_for_litigation = "\n".join(iter_litigation_paragraphs(lines_no_spaces))
+    return lines_no_spaces, full_text_for_litigation
+
+
+def extract_text_from_pdf(pdf_path, output_dir, base_name, debug_dumps=False):
+    # 只有开启 --debug-dumps 时才把原始文本落盘，正常处理全程在内存中逐页流式进行
+    dump_path = os.path.join(output_dir, f"{base_name}_debug.txt") if debug_dumps else None
+    lines_no_spaces, full_text_for_litigation = extract_pdf_text(pdf_path, dump_path)
+    return extract_text_from_txt(lines_no_spaces, full_text_for_litigation)
+
+
+def special_segment_trial_result(text: str) -> str:
+    # 给所有“一、二、三、...”前加换行符，防止粘连
+    text = _TRIAL_ITEM_RE.sub('\n', text)
+    # 按行处理，汉字不超过35个的行末尾加<PARA>
+    return "\n".join(line if hanzi_count(line) > 35 else line + "<PARA>" for line in text.split('\n'))
+
+
+def extract_judge_info_from_no_spaces(txt_no_spaces):
+    lines = txt_no_spaces.split('\n')
+
+    # 找到第一个只含“审判人员”的行
+    judge_start_line = -1
+    for i, line in enumerate(lines):
+        if line.strip() == "审判人员":
+            judge_start_line = i
+            break
+    if judge_start_line == -1:
+        return ""
+
+    # 从judge_start_line+1开始找包含“审判长”相关的行
+    start_judge = -1
+    for i in range(judge_start_line + 1, len(lines)):
+        if any(x in lines[i] for x in ["审判长", "审 判 长", "审判 长"]):
+            start_judge = i
+            break
+    if start_judge == -1:
+        return ""
+
+    # 从start_judge开始找第一个包含“书记员”相关的行
+    end_judge = -1
+    for i in range(start_judge, len(lines)):
+        if any(x in lines[i] for x in ["书记员", "书记 员", "书 记 员"]):
+            end_judge = i
+            break
+    if end_judge == -1:
+        return ""
+
+    judge_lines = lines[start_judge:end_judge + 1]
+    judge_info = "\n".join(judge_lines).strip()
+    return judge_info
+
+def _ends_paragraph(line):
+    return (len(line) <= 40 and line.endswith('。')) or len(line) < 10
+
+def add_para_tags(lines):
+    """对每行判断，少于等于35个字符且以句号结尾的行，或少于10个字符的行，后加<PARA>"""
+    new_lines = []
+    for line in lines:
+        if _ends_paragraph(line):
+            new_lines.append(line + '<PARA>')
+        else:
+            new_lines.append(line)
+    return new_lines
+
+def pdf_case_number(txt_no_spaces):
+    """案号：第二个含中文冒号的行冒号之后的内容"""
+    colon_count = 0
+    for line in txt_no_spaces:
+        if '：' in line:
+            colon_count += 1
+            if colon_count == 2:
+                return line.split('：', 1)[1].strip()
+    return "未知案号"
+
+
+def extract_text_from_txt(txt_no_spaces, full_text_for_litigation):
+    # 提取案名和案号
+    first_colon_idx = next((i for i, line in enumerate(txt_no_spaces) if '：' in line), None)
+    if first_colon_idx is None:
+        # 全文没有中文冒号（如扫描件只提取到零星文字）：取不到标题和案名
+        fuzzy_title = ""
+        first_colon_line = ""
+    else:
+        text_before_first_colon = "".join(txt_no_spaces[:first_colon_idx]).strip()
+
+        keywords = ["判决书", "裁定书", "案"]
+        indices = []
+        for kw in keywords:
+            idx = text_before_first_colon.find(kw)
+            indices.append(idx if idx != -1 else float('inf'))
+
+        min_index = min(indices)
+        if min_index == float('inf'):
+            fuzzy_title = text_before_first_colon
+        else:
+            # 找到最早出现的关键词
+            kw_index = indices.index(min_index)
+            kw = keywords[kw_index]
+            # 截取包含关键词本身
+            fuzzy_title = text_before_first_colon[:min_index + len(kw)].strip()
+
+        first_colon_line = txt_no_spaces[first_colon_idx]
+
+    before_colon, after_colon = "", ""
+    if first_colon_line:
+        parts = first_colon_line.split('：')
+        if len(parts) >= 2:
+            before_colon = parts[0]
+            after_colon = parts[1]
+    m_admin = re.search(r'(行政.*)', fuzzy_title)
+    part_before = m_admin.group(1) if m_admin else ""
+    case_name = (after_colon + part_before).strip()
+
+    case_number = pdf_case_number(txt_no_spaces)
+
+    # 定位当事人与审理经过之间的行，提取当事人信息
+    try:
+        start_party = next(i for i, l in enumerate(txt_no_spaces) if '当事人' in l)
+        end_party = next(i for i, l in enumerate(txt_no_spaces) if '审理经过' in l)
+    except StopIteration:
+        start_party, end_party = 0, 0
+
+    parties_txt_no_spaces = []
+    for line in txt_no_spaces[start_party + 1:end_party]:
+        if any(k in line for k in ['原告', '被告', '上诉人', '被上诉人', '再审申请人', '被申请人']):
+            if '住所地' in line:
+                line = line.split('住所地')[0].strip()
+            parties_txt_no_spaces.append(line.strip())
+    parties_info = "\n".join(parties_txt_no_spaces).replace(fuzzy_title, "").strip()
+
+    index = SectionIndex(full_text_for_litigation)
+
+    # 提取诉讼过程：“审理经过”之后到第一个“审理终结。/审查终结。”（含）
+    litigation_process = "诉讼记录缺失"
+    pos = index.find("审理经过")
+    if pos != -1:
+        start = pos + len("审理经过")
+        end, end_marker = index.find_first(_PROCESS_END_MARKERS, start)
+        if end != -1:
+            litigation_process = full_text_for_litigation[start:end + len(end_marker)].strip()
+    litigation_process = litigation_process.replace(fuzzy_title, "").strip()
+    litigation_process = litigation_process.replace('<PARA>', '\n')
+    litigation_process = "\n".join(p.strip() for p in litigation_process.split('\n') if p.strip())
+
+    # 案件基本情况
+    pos_case_info_start = full_text_for_litigation.find(litigation_process.replace('\n', ' ')) + len(litigation_process.replace('\n', ' '))
+    pos_case_info_end = index.find("本院认为", pos_case_info_start)
+    if pos_case_info_end == -1:
+        case_info = "案件基本情况缺失"
+    else:
+        case_info_text = full_text_for_litigation[pos_case_info_start:pos_case_info_end].strip()
+        for kw in ["一审法院认为与裁判", "二审法院认为与裁判", "再审诉讼请求", "再审辩方观点", "本院查明"]:
+            case_info_text = case_info_text.replace(kw, "")
+        case_info = case_info_text.replace(fuzzy_title, "").strip()
+    case_info = case_info.replace('<PARA>', '\n')
+    case_info = "\n".join(p.strip() for p in case_info.split('\n') if p.strip())
+    logger.debug("case_info: %r", case_info)
+
+    # 裁判分析过程
+    pos_analysis_start = pos_case_info_end
+    pos_analysis_end1 = index.find("判决如下：", pos_analysis_start)
+    pos_analysis_end2 = index.find("裁定如下：", pos_analysis_start)
+    if pos_analysis_end1 == -1 and pos_analysis_end2 == -1:
+        trial_analysis = "裁判分析过程缺失"
+        # 裁判结果从“本院认为”之后（没有则从头）开始找
+        pos_analysis_end = max(pos_analysis_start, 0)
+    else:
+        if pos_analysis_end1 == -1:
+            pos_analysis_end = pos_analysis_end2
+            end_marker = "裁定如下："
+        elif pos_analysis_end2 == -1:
+            pos_analysis_end = pos_analysis_end1
+            end_marker = "判决如下："
+        else:
+            if pos_analysis_end1 < pos_analysis_end2:
+                pos_analysis_end = pos_analysis_end1
+                end_marker = "判决如下："
+            else:
+                pos_analysis_end = pos_analysis_end2
+                end_marker = "裁定如下："
+        pos_analysis_end += len(end_marker)
+
+        trial_analysis_text = full_text_for_litigation[pos_analysis_start:pos_analysis_end].strip()
+        trial_analysis = trial_analysis_text.replace("本院认为", "", 1).strip()
+
+    trial_analysis = trial_analysis.replace('<PARA>', '\n')
+    trial_analysis = "\n".join(p.strip() for p in trial_analysis.split('\n') if p.strip())
+
+    # 裁判结果
+    pos_result_start = index.find("裁判结果", pos_analysis_end)
+    pos_result_end = index.find("审判人员", pos_result_start)
+    if pos_result_start == -1 or pos_result_end == -1:
+        trial_result = "裁判结果缺失"
+    else:
+        trial_result_raw = full_text_for_litigation[pos_result_start:pos_result_end].strip()
+        trial_result_raw = special_segment_trial_result(trial_result_raw)
+        trial_result = trial_result_raw.replace(fuzzy_title, "").strip()
+        trial_result = trial_result.replace('<PARA>', '\n')
+        trial_result = "\n".join(p.strip() for p in trial_result.split('\n') if p.strip())
+    if trial_result.startswith("裁判结果"):
+        trial_result = trial_result[len("裁判结果"):].strip()
+
+    # 提取审判人员信息
+    judge_info = extract_judge_info_from_no_spaces("\n".join(txt_no_spaces))
+    judge_info = judge_info.replace('<PARA>', '\n')
+    judge_info = "\n".join(p.strip() for p in judge_info.split('\n') if p.strip())
+
+    # 清理judge_info中汉字间多余空格（保留换行）
+    judge_info = _HANZI_GAP_RE.sub(r'\1\2', judge_info).strip()
+
+    return {
+        'case_name': case_name,
+        'case_number': case_number,
+        'litigation_process': litigation_process,
+        'parties_info': parties_info,
+        'case_info': case_info,
+        'trial_analysis': trial_analysis,
+        'trial_result': trial_result,
+        'judge_info': judge_info
+    }
+
+# ---------------- 样式设置函数 ----------------
+
+_FONT_FAMILY = "'Helvetica Neue', Helvetica, 'Hiragino Sans GB', 'Microsoft YaHei', Arial, sans-serif"
+
+
+@functools.lru_cache(maxsize=None)
+def paragraph_template(color, size, bold=False, align='left', line_height=2, indent_px=16,
+                       margin_top=0, margin_bottom=0, background="#ffffff", font_family=_FONT_FAMILY):
+    """每种样式只拼一次内联 CSS，返回 (前缀, 后缀)，段落 HTML 即 前缀 + 文本 + 后缀"""
+    style = f"""
+        color:{color};
+        font-size:{size}px;
+        text-align:{align};
+        line-height:{line_height};
+        margin-top:{margin_top}px;
+        margin-bottom:{margin_bottom}px;
+        margin-left:{indent_px}px;
+        margin-right:{indent_px}px;
+        background-color:{background};
+        font-family:{font_family};
+        {'font-weight:bold;' if bold else ''}
+    """
+    return f'<p style="{style.strip()}">', '</p>'
+
+
+def styled_paragraph(text, color, size, bold=False, align='left', line_height=2, indent_px=16,
+                     margin_top=0, margin_bottom=0, background="#ffffff", font_family=_FONT_FAMILY):
+    prefix, suffix = paragraph_template(color, size, bold, align, line_height, indent_px,
+                                        margin_top, margin_bottom, background, font_family)
+    return f'{prefix}{text}{suffix}'
+
+
+def iter_styled_paragraphs(paragraphs, color, size, bold=False, align='justify', line_height=2, indent_px=16,
+                           margin_top=0, margin_bottom=0, background="#ffffff", only_last_has_margin=False,
+                           last_margin_bottom=32, font_family=_FONT_FAMILY):
+    """逐段产出 styled_paragraphs 的 HTML 片段（段与段之间产出换行）"""
+    prefix, suffix = paragraph_template(color, size, bold, align, line_height, indent_px,
+                                        margin_top, margin_bottom, background, font_family)
+    last = len(paragraphs) - 1
+    for idx, p in enumerate(paragraphs):
+        if idx:
+            yield "\n"
+        if only_last_has_margin and idx == last:
+            prefix, suffix = paragraph_template(color, size, bold, align, line_height, indent_px,
+                                                margin_top, last_margin_bottom, background, font_family)
+        yield prefix
+        yield p
+        yield suffix
+
+
+def styled_paragraphs(paragraphs, color, size, bold=False, align='justify', line_height=2, indent_px=16,
+                      margin_top=0, margin_bottom=0, background="#ffffff", only_last_has_margin=False,
+                      last_margin_bottom=32, font_family=_FONT_FAMILY):
+    return "".join(iter_styled_paragraphs(
+        paragraphs, color, size, bold, align, line_height, indent_px, margin_top, margin_bottom,
+        background, only_last_has_margin, last_margin_bottom, font_family
+    ))
+
+
+
+# ---------------- 公众号 HTML 生成 ----------------
+
+def _heading(title):
+    prefix, suffix = paragraph_template("#5287b7", 16, bold=True, align='left', margin_bottom=32)
+    return (prefix, title, suffix)
+
+
+def _body_line(text, align='left', margin_bottom=0):
+    prefix, suffix = paragraph_template("#5e5e5e", 16, align=align, margin_bottom=margin_bottom)
+    return (prefix, text, suffix)
+
+
+def _wechat_html_parts(data):
+    """依次产出 HTML 的各个部分，每部分是一组字符串片段，部分之间以换行分隔"""
+    yield ('<meta charset="UTF-8">',)
+
+    yield _heading('【裁判要旨】')
+    yield _body_line("在此输入裁判要旨内容", align='justify', margin_bottom=32)
+    yield _heading('【文书全文】')
+    yield _heading('【文书标题、案号及来源】')
+
+    yield _body_line("标题：" + data['case_name'])
+    yield _body_line("案号：" + data['case_number'])
+    yield _body_line("来源：威科先行", margin_bottom=32)
+
+    yield _heading('【当事人信息】')
+    yield iter_styled_paragraphs(data['parties_info'].split('\n'), "#5e5e5e", 16, margin_bottom=0, only_last_has_margin=True, last_margin_bottom=32)
+    yield _heading('【诉讼记录】')
+    yield iter_styled_paragraphs(data['litigation_process'].split('\n'), "#5e5e5e", 16, margin_bottom=32)
+    yield _heading('【案件基本情况】')
+    yield iter_styled_paragraphs(data['case_info'].split('\n'), "#5e5e5e", 16, margin_bottom=32, only_last_has_margin=True, last_margin_bottom=32)
+    yield _heading('【裁判分析过程】')
+    yield iter_styled_paragraphs(data['trial_analysis'].split('\n'), "#5e5e5e", 16, margin_bottom=32, only_last_has_margin=True, last_margin_bottom=32)
+    yield _heading('【裁判结果】')
+    yield iter_styled_paragraphs(data['trial_result'].split('\n'), "#5e5e5e", 16, margin_bottom=0)
+
+    yield itertools.chain(
+        ('<br>',),
+        iter_styled_paragraphs(data['judge_info'].split('\n'), "#5e5e5e", 16, align='right', margin_bottom=0),
+        ('<br>',),
+    )
+
+
+def write_wechat_html(data, out):
+    """把公众号 HTML 直接写入已打开的文件或缓冲区，不在内存中拼出整篇文档"""
+    parts = _wechat_html_parts(data)
+    out.writelines(next(parts))
+    for part in parts:
+        out.write("\n")
+        out.writelines(part)
+
+
+def generate_wechat_html(data, image_map=None):
+    buf = io.StringIO()
+    write_wechat_html(data, buf)
+    return buf.getvalue()
+
+# ---------------- 本地图片内联（base64） ----------------
+
+# 超过该大小的图片保留原链接，不内联
+DEFAULT_MAX_INLINE_IMAGE_BYTES = 2 * 1024 * 1024
+# 每个进程缓存的已编码图片总大小上限
+IMAGE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# 读取图片的块大小，取 3 的倍数，逐块编码的 base64 可以直接拼接
+_IMAGE_CHUNK = 3 * 64 * 1024
+
+_IMG_TAG_RE = re.compile(r'<img\b[^>]*>', re.I)
+# 缓冲区末尾尚未闭合的 <img 标签（或其开头几个字符），留到下次写入时再处理
+_IMG_TAIL_RE = re.compile(r'<img\b[^>]*$|<(?:i(?:m(?:g)?)?)?$', re.I)
+_IMG_SRC_RE = re.compile(r'''\bsrc\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))''', re.I)
+_URL_SCHEME_RE = re.compile(r'^[a-zA-Z][a-zA-Z0-9+.-]*:')
+
+
+class ImageInliner:
+    """把本地图片编码为 data URI。编码结果按内容 SHA-256 缓存（同一枚公章、logo 在上百篇
+    文书里只读取、编码一次），文件路径到摘要的映射按 (大小, 修改时间) 判断是否失效。"""
+
+    def __init__(self, max_image_bytes=DEFAULT_MAX_INLINE_IMAGE_BYTES, cache_max_bytes=IMAGE_CACHE_MAX_BYTES):
+        self.max_image_bytes = max_image_bytes
+        self.cache_max_bytes = cache_max_bytes
+        self.digests = {}          # 真实路径 -> (size, mtime_ns, 摘要)
+        self.encoded = {}          # 摘要 -> data URI（按插入/使用顺序，最早的先淘汰）
+        self.cached_bytes = 0
+
+    def resolve(self, src, base_dir):
+        """src 是相对 base_dir 的本地路径时返回其路径；远程地址、data URI、file: URL、绝对路径
+        以及（经 .. 或符号链接）指向 base_dir 之外的路径都返回 None，不内联。
+        HTML 内容来自文书正文，不能让文书把本机任意文件嵌进输出。"""
+        import html
+        from urllib.parse import unquote
+        src = html.unescape(src).strip()
+        if not src or src.startswith(("/", "\\")) or _URL_SCHEME_RE.match(src):
+            return None
+        relative = unquote(src.split("#", 1)[0].split("?", 1)[0])
+        if not relative or os.path.isabs(relative) or os.path.splitdrive(relative)[0]:
+            return None
+        path = os.path.join(base_dir, relative)
+        root = os.path.realpath(base_dir)
+        real = os.path.realpath(path)
+        if os.path.commonpath([root, real]) != root:
+            return None
+        return path
+
+    def write_data_uri(self, path, out, stats):
+        """把 path 编码为 data URI 写入 out；文件不存在或超过大小上限时返回 False"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            stats['images_missing'] += 1
+            return False
+        if not os.path.isfile(path) or st.st_size > self.max_image_bytes:
+            stats['images_linked'] += 1
+            return False
+        real = os.path.realpath(path)
+        known = self.digests.get(real)
+        if known and known[:2] == (st.st_size, st.st_mtime_ns):
+            uri = self.encoded.pop(known[2], None)
+            if uri is not None:
+                self.encoded[known[2]] = uri   # 移到最近使用
+                out.write(uri)
+                stats['images_inlined'] += 1
+                stats['image_cache_hits'] += 1
+                return True
+
+        import mimetypes
+        mime = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        header = f"data:{mime};base64,"
+        chunks = [header]
+        out.write(header)
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(_IMAGE_CHUNK), b""):
+                h.update(block)
+                encoded = base64.b64encode(block).decode("ascii")
+                out.write(encoded)
+                chunks.append(encoded)
+        digest = h.hexdigest()
+        self.digests[real] = (st.st_size, st.st_mtime_ns, digest)
+        if digest not in self.encoded:
+            uri = "".join(chunks)
+            self.encoded[digest] = uri
+            self.cached_bytes += len(uri)
+            while self.cached_bytes > self.cache_max_bytes and self.encoded:
+                self.cached_bytes -= len(self.encoded.pop(next(iter(self.encoded))))
+        stats['images_inlined'] += 1
+        return True
+
+
+_image_inliners = {}
+
+
+def get_image_inliner(max_image_bytes=DEFAULT_MAX_INLINE_IMAGE_BYTES):
+    """每个进程共用一个图片缓存"""
+    inliner = _image_inliners.get(max_image_bytes)
+    if inliner is None:
+        inliner = _image_inliners[max_image_bytes] = ImageInliner(max_image_bytes)
+    return inliner
+
+
+class ImageInliningWriter:
+    """包在输出文件外的写入器：边写边把 <img src="本地路径"> 换成 data URI，不构建 DOM。
+    写入内容先攒成块再扫描，未闭合的 <img 标签留到下一块；用完须调用 close()。"""
+
+    def __init__(self, out, base_dir, inliner=None, stats=None, buffer_size=64 * 1024):
+        self.out = out
+        self.base_dir = base_dir
+        self.inliner = inliner or get_image_inliner()
+        self.stats = stats if stats is not None else defaultdict(int)
+        self.buffer_size = buffer_size
+        self._parts = []
+        self._size = 0
+
+    def write(self, text):
+        self._parts.append(text)
+        self._size += len(text)
+        if self._size >= self.buffer_size:
+            self._process(final=False)
+
+    def writelines(self, lines):
+        lines = list(lines)
+        self._parts.extend(lines)
+        self._size += sum(map(len, lines))
+        if self._size >= self.buffer_size:
+            self._process(final=False)
+
+    def close(self):
+        self._process(final=True)
+
+    def _process(self, final):
+        buf = "".join(self._parts)
+        end = len(buf)
+        if not final:
+            # 未闭合的标签里不会有 ">"，只需在最后一个 ">" 之后查找
+            tail = _IMG_TAIL_RE.search(buf, buf.rfind(">") + 1)
+            if tail:
+                end = tail.start()
+        pos = 0
+        # 绝大多数文书没有图片，先用 str 查找排除，免去逐字符的不区分大小写匹配
+        has_img = "<i" in buf or "<I" in buf
+        for m in (_IMG_TAG_RE.finditer(buf, 0, end) if has_img else ()):
+            self.out.write(buf[pos:m.start()])
+            self._write_tag(m.group())
+            pos = m.end()
+        self.out.write(buf[pos:end])
+        self._parts = [buf[end:]] if end < len(buf) else []
+        self._size = len(buf) - end
+
+    def _write_tag(self, tag):
+        m = _IMG_SRC_RE.search(tag)
+        if m:
+            group = next(i for i in (1, 2, 3) if m.group(i) is not None)
+            path = self.inliner.resolve(m.group(group), self.base_dir)
+            if path is not None:
+                quote = '"' if group != 2 else "'"
+                start = m.start(group) - (group != 3)
+                end = m.end(group) + (group != 3)
+                self.out.write(tag[:start] + quote)
+                if not self.inliner.write_data_uri(path, self.out, self.stats):
+                    self.out.write(m.group(group))
+                self.out.write(quote + tag[end:])
+                return
+        self.out.write(tag)
+
+
+def convert_html_images_to_base64(html_path, output_path=None, max_image_bytes=DEFAULT_MAX_INLINE_IMAGE_BYTES):
+    """将 HTML 中本地图片路径转换为 base64（逐块读写，不解析整篇 DOM），返回内联统计"""
+    output_path = output_path or html_path.replace('.html', '_base64.html')
+    stats = defaultdict(int)
+    base_dir = os.path.dirname(os.path.abspath(html_path))
+    with open(html_path, 'r', encoding='utf-8') as src, open(output_path, 'w', encoding='utf-8') as f:
+        writer = ImageInliningWriter(f, base_dir, get_image_inliner(max_image_bytes), stats)
+        for chunk in iter(lambda: src.read(64 * 1024), ""):
+            writer.write(chunk)
+        writer.close()
+
+    print(f"转换完成！输出文件: {output_path}")
+    return dict(stats)
+
+# ---------------- 运行监测 ----------------
+
+# JUDGMENT_LOG_LEVEL=DEBUG 可查看各字段的提取结果；
+# JUDGMENT_PROFILE=cprofile,tracemalloc 打开逐文件性能剖析（可只开其中一个）
+LOG_LEVEL_ENV = "JUDGMENT_LOG_LEVEL"
+METRICS_LOG_ENV = "JUDGMENT_METRICS_LOG"
+PROFILE_ENV = "JUDGMENT_PROFILE"
+PROFILE_DIR_ENV = "JUDGMENT_PROFILE_DIR"
+
+metrics_logger = logging.getLogger("main02noimage.metrics")
+
+
+def setup_logging(metrics_log=None):
+    """配置日志：普通日志按环境变量级别输出到 stderr；
+    metrics_log（默认取 JUDGMENT_METRICS_LOG）给出时，每个文件的监测记录以一行 JSON
+    写入该文件（"-" 表示 stderr）"""
+    metrics_log = metrics_log or os.environ.get(METRICS_LOG_ENV)
+    level = os.environ.get(LOG_LEVEL_ENV, "WARNING").upper()
+    logging.basicConfig(level=getattr(logging, level, logging.WARNING),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    if metrics_log:
+        handler = logging.StreamHandler(sys.stderr) if metrics_log == "-" \
+            else logging.FileHandler(metrics_log, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        metrics_logger.addHandler(handler)
+        metrics_logger.setLevel(logging.INFO)
+        metrics_logger.propagate = False
+
+
+def log_metrics(record):
+    if metrics_logger.isEnabledFor(logging.INFO):
+        metrics_logger.info(json.dumps(record, ensure_ascii=False))
+
+
+class DocTrace:
+    """记录单个文书各阶段耗时、规模和结果，最终作为一条结构化监测记录"""
+
+    def __init__(self, path):
+        self.start = time.perf_counter()
+        self.record = {
+            'event': 'document',
+            'path': path,
+            'ext': os.path.splitext(path)[1].lower(),
+            'stages': {},
+            'outcome': None,
+        }
+        # 正在执行的阶段，供 DocBudget 在超出预算时报告；on_stage 在进入每个阶段时回调
+        self.current_stage = None
+        self.on_stage = None
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        previous, self.current_stage = self.current_stage, name
+        if self.on_stage:
+            self.on_stage(name)
+        try:
+            yield
+        except BaseException:
+            self.record.setdefault('failed_stage', name)
+            raise
+        finally:
+            self.current_stage = previous
+            self.record['stages'][name] = round((time.perf_counter() - start) * 1000, 3)
+
+    def finish(self, outcome, error=None):
+        self.record['outcome'] = outcome
+        if error:
+            self.record['error'] = error
+        self.record['total_ms'] = round((time.perf_counter() - self.start) * 1000, 3)
+        return self.record
+
+
+class MetricsReport:
+    """汇总一批文件的监测记录，输出各阶段的次数、总耗时和 p50/p95"""
+
+    def __init__(self):
+        self.stages = defaultdict(list)
+        self.outcomes = defaultdict(int)
+
+    def add(self, record):
+        if not record:
+            return
+        self.outcomes[record['outcome']] += 1
+        for name, ms in record['stages'].items():
+            self.stages[name].append(ms)
+        if 'total_ms' in record:
+            self.stages['total'].append(record['total_ms'])
+
+    def lines(self):
+        out = [f"{'阶段':<14}{'次数':>6}{'总计 s':>10}{'p50 ms':>10}{'p95 ms':>10}"]
+        for name, samples in self.stages.items():
+            ordered = sorted(samples)
+            p50 = ordered[(len(ordered) - 1) // 2]
+            p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+            out.append(f"{name:<14}{len(samples):>6}{sum(samples) / 1000:>10.2f}{p50:>10.2f}{p95:>10.2f}")
+        return out
+
+
+_profiler = None
+
+
+def _profile_modes():
+    return {m.strip().lower() for m in os.environ.get(PROFILE_ENV, "").split(",") if m.strip()}
+
+
+@contextlib.contextmanager
+def profiling(trace):
+    """按 JUDGMENT_PROFILE 开启剖析：cprofile 的累计结果写到
+    $JUDGMENT_PROFILE_DIR/profile-<pid>.prof（每个进程一个文件，可用 pstats 合并查看）；
+    tracemalloc 把单个文件处理期间的 Python 内存峰值记入监测记录"""
+    global _profiler
+    modes = _profile_modes()
+    if not modes:
+        yield
+        return
+    if "tracemalloc" in modes:
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+    if "cprofile" in modes:
+        import cProfile
+        if _profiler is None:
+            _profiler = cProfile.Profile()
+        _profiler.enable()
+    try:
+        yield
+    finally:
+        if "cprofile" in modes:
+            _profiler.disable()
+            profile_dir = os.environ.get(PROFILE_DIR_ENV) or os.getcwd()
+            _profiler.dump_stats(os.path.join(profile_dir, f"profile-{os.getpid()}.prof"))
+        if "tracemalloc" in modes:
+            import tracemalloc
+            trace.record['peak_mem_kb'] = tracemalloc.get_traced_memory()[1] // 1024
+
+# ---------------- 转换结果缓存 ----------------
+
+# 解析或排版逻辑有改动时递增，旧版本的缓存条目自然失效
+PARSER_VERSION = "1"
+CACHE_FILENAME = "convert_cache.sqlite3"
+DEFAULT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ResultCache:
+    """以“解析器版本 + 输入文件 SHA-256”为键缓存解析字段和生成的 HTML，
+    开启查重时另存正文的 MinHash 签名及查重用的案号，命中缓存时不必重新提取文本也能查重。
+    存放在输出目录下的 SQLite 中，总大小超过上限时按最近使用时间淘汰。
+    多个工作进程可同时读写（WAL 模式）。"""
+
+    def __init__(self, path, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY, fields TEXT NOT NULL, html TEXT NOT NULL,"
+            " size INTEGER NOT NULL, last_used REAL NOT NULL, signature BLOB, dedup_case TEXT)"
+        )
+        # 早先建立的缓存库没有签名列
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(results)")}
+        for column, kind in (("signature", "BLOB"), ("dedup_case", "TEXT")):
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE results ADD COLUMN {column} {kind}")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results(last_used)")
+        self.conn.commit()
+
+    @staticmethod
+    def key_for(digest):
+        return f"{PARSER_VERSION}:{digest}"
+
+    def get(self, key):
+        """命中时返回 (字段 dict, html)，否则返回 None"""
+        row = self.conn.execute("SELECT fields, html FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        with self.conn:
+            self.conn.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0]), row[1]
+
+    def put(self, key, fields, html, signature=None, dedup_case=None):
+        fields_json = json.dumps(fields, ensure_ascii=False)
+        size = len(fields_json.encode("utf-8")) + len(html.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        blob = struct.pack(f"<{DEDUP_BINS}I", *signature) if signature is not None else None
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO results (key, fields, html, size, last_used, signature, dedup_case)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, fields_json, html, size, time.time(), blob, dedup_case),
+            )
+            self._evict()
+
+    def get_signature(self, key):
+        """返回缓存的 (查重用案号, MinHash 签名)；条目不存在或存入时未开启查重返回 None"""
+        row = self.conn.execute("SELECT dedup_case, signature FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] is None:
+            return None
+        return row[0], list(struct.unpack(f"<{DEDUP_BINS}I", row[1]))
+
+    def set_signature(self, key, dedup_case, signature):
+        with self.conn:
+            self.conn.execute("UPDATE results SET dedup_case = ?, signature = ? WHERE key = ?",
+                              (dedup_case, struct.pack(f"<{DEDUP_BINS}I", *signature), key))
+
+    def _evict(self):
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        stale = []
+        for key, size in self.conn.execute("SELECT key, size FROM results ORDER BY last_used"):
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        self.conn.executemany("DELETE FROM results WHERE key = ?", stale)
+
+
+_result_caches = {}
+
+
+def get_result_cache(output_dir, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+    """每个进程每个输出目录只打开一次缓存库"""
+    path = os.path.join(output_dir, CACHE_FILENAME)
+    cache = _result_caches.get(path)
+    if cache is None:
+        cache = _result_caches[path] = ResultCache(path, max_bytes)
+    cache.max_bytes = max_bytes
+    return cache
+
+# ---------------- 近似重复检测 ----------------
+
+DEDUP_FILENAME = "dedup_index.sqlite3"
+DEDUP_MODES = ("flag", "skip")
+# 估计相似度（相同分段最小值所占比例）达到该值且案号一致时视为同一篇文书
+DEFAULT_DEDUP_THRESHOLD = 0.8
+# 签名由 DEDUP_BINS 个分段最小哈希组成，按每 DEDUP_BAND_ROWS 个一组建 LSH 索引
+DEDUP_BINS = 64
+DEDUP_BAND_ROWS = 4
+# 按连续 DEDUP_SHINGLE 个字取片段
+DEDUP_SHINGLE = 5
+
+_NON_WORD_RE = re.compile(r'[\W_]+')
+
+
+def text_fingerprint(text):
+    """文书正文的 MinHash 签名（DEDUP_BINS 个 32 位整数）。
+    只保留文字和数字，PDF 与 DOCX 在换行、空格、标点上的差异不影响结果。
+    每个片段只算一次 CRC32，把哈希空间均分为 DEDUP_BINS 段、取各段最小值（一次置换 MinHash），
+    排序和二分都在 C 层完成；空段沿用下一个非空段的值。"""
+    data = _NON_WORD_RE.sub("", text).encode("utf-16-le")
+    width = 2 * DEDUP_SHINGLE
+    hashes = sorted({zlib.crc32(data[i:i + width]) for i in range(0, max(len(data) - width, 0) + 1, 2)})
+    step = (1 << 32) // DEDUP_BINS
+    signature = [None] * DEDUP_BINS
+    for j in range(DEDUP_BINS):
+        i = bisect_left(hashes, j * step)
+        if i < len(hashes) and hashes[i] < (j + 1) * step:
+            signature[j] = hashes[i]
+    # 至少有一段非空（空文本也有一个片段）；从最后一个非空段倒着往前填
+    last = next(j for j in reversed(range(DEDUP_BINS)) if signature[j] is not None)
+    for j in range(last - 1, last - DEDUP_BINS, -1):
+        if signature[j] is None:
+            signature[j] = signature[(j + 1) % DEDUP_BINS]
+    return signature
+
+
+def fingerprint_similarity(a, b):
+    return sum(x == y for x, y in zip(a, b)) / DEDUP_BINS
+
+
+def _band_keys(signature):
+    keys = []
+    for band in range(0, DEDUP_BINS, DEDUP_BAND_ROWS):
+        packed = struct.pack(f"<H{DEDUP_BAND_ROWS}I", band, *signature[band:band + DEDUP_BAND_ROWS])
+        keys.append(int.from_bytes(hashlib.blake2b(packed, digest_size=8).digest(), "little", signed=True))
+    return keys
+
+
+def _same_case_number(a, b):
+    # 案号不同的是系列案（正文几乎相同、当事人和案号不同），不算重复；一方未取到案号时只看正文
+    return a == b or "未知案号" in (a, b)
+
+
+class DedupIndex:
+    """近似重复文书索引，存放在输出目录下的 SQLite 中，跨批次保留。
+    每篇原件登记案号和 MinHash 签名，签名按 LSH 分组建索引，查重时只比较至少一组完全相同的文书；
+    重复的文书登记时记下其原件，自身不进 LSH 索引。命中转换缓存的文书用缓存中的签名照常查重。
+    多个工作进程共用：查重和登记在同一个写事务中完成，同时处理的两份副本只有一份被当作原件。"""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " id INTEGER PRIMARY KEY, source_path TEXT NOT NULL UNIQUE, case_number TEXT NOT NULL,"
+            " signature BLOB NOT NULL, digest TEXT, original TEXT, similarity REAL, added_at REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS documents_digest ON documents(digest);"
+            "CREATE TABLE IF NOT EXISTS bands (key INTEGER NOT NULL, doc_id INTEGER NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS bands_key ON bands(key);"
+            "CREATE INDEX IF NOT EXISTS bands_doc_id ON bands(doc_id);"
+        )
+
+    def check_and_add(self, source_path, case_number, signature, threshold=DEFAULT_DEDUP_THRESHOLD, digest=None):
+        """与已登记的原件比较：找到相似度不低于 threshold 且案号一致的，返回 (原件路径, 相似度)，否则返回 None。
+        本篇随后登记（同一路径的旧记录被替换），不重复的成为新的原件。
+        digest 为文件内容的 SHA-256，随记录保存备查。"""
+        source_path = os.path.abspath(source_path)
+        keys = _band_keys(signature)
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            best = None
+            rows = self.conn.execute(
+                "SELECT source_path, case_number, signature FROM documents WHERE id IN"
+                f" (SELECT doc_id FROM bands WHERE key IN ({', '.join('?' * len(keys))})) AND source_path != ?",
+                keys + [source_path],
+            )
+            for path, number, blob in rows:
+                if not _same_case_number(case_number, number):
+                    continue
+                similarity = fingerprint_similarity(signature, struct.unpack(f"<{DEDUP_BINS}I", blob))
+                if similarity >= threshold and (best is None or similarity > best[1]):
+                    best = (path, similarity)
+            old = self.conn.execute("SELECT id FROM documents WHERE source_path = ?", (source_path,)).fetchone()
+            if old:
+                self.conn.execute("DELETE FROM bands WHERE doc_id = ?", old)
+                self.conn.execute("DELETE FROM documents WHERE id = ?", old)
+            original, similarity = best if best else (None, None)
+            doc_id = self.conn.execute(
+                "INSERT INTO documents (source_path, case_number, signature, digest, original, similarity, added_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (source_path, case_number, struct.pack(f"<{DEDUP_BINS}I", *signature), digest,
+                 original, similarity, time.time()),
+            ).lastrowid
+            if best is None:
+                self.conn.executemany("INSERT INTO bands (key, doc_id) VALUES (?, ?)", [(key, doc_id) for key in keys])
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        return best
+
+
+_dedup_indexes = {}
+
+
+def get_dedup_index(output_dir):
+    """每个进程每个输出目录只打开一次查重索引"""
+    path = os.path.join(output_dir, DEDUP_FILENAME)
+    index = _dedup_indexes.get(path)
+    if index is None:
+        index = _dedup_indexes[path] = DedupIndex(path)
+    return index
+
+# ---------------- 解析字段导出 ----------------
+
+EXPORT_FIELDS = ('case_name', 'case_number', 'parties_info', 'litigation_process',
+                 'case_info', 'trial_analysis', 'trial_result', 'judge_info')
+
+EXPORT_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS judgments (
+    id INTEGER PRIMARY KEY,
+    source_path TEXT NOT NULL UNIQUE,
+    {", ".join(f"{name} TEXT NOT NULL" for name in EXPORT_FIELDS)},
+    exported_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS judgments_case_number ON judgments(case_number);
+CREATE VIRTUAL TABLE IF NOT EXISTS judgments_fts USING fts5({", ".join(EXPORT_FIELDS)});
+"""
+
+# 去掉 fts_tokens 插入的空格：每个原字符后都跟着一个空格（摘要中的【】标记除外）
+_FTS_PADDING_RE = re.compile(r'(.) ', re.S)
+
+
+def fts_tokens(text):
+    """FTS5 的 unicode61 分词器会把一串连续汉字当成一个词，无法按人名、短语检索。
+    在每个字符之间插入空格，每个字成为一个词，任意长度的片段都能按短语匹配。"""
+    return " ".join(text)
+
+
+def _fts_untokenize(text):
+    return _FTS_PADDING_RE.sub(r'\1', text)
+
+
+def fts_query(query, field=None):
+    """把空格分隔的关键词转成 FTS5 查询：每个关键词作为一个短语，多个关键词同时满足"""
+    phrases = []
+    for term in query.split():
+        tokens = fts_tokens(term).split()
+        if tokens:
+            phrases.append('"' + " ".join(tokens).replace('"', '""') + '"')
+    if not phrases:
+        raise ValueError("检索词为空")
+    match = " AND ".join(phrases)
+    return f"{{{field}}} : ({match})" if field else match
+
+
+class FieldExporter:
+    """把每篇文书的解析字段追加到 JSONL 文件和/或 SQLite 库（带 FTS5 全文索引）。
+    在主进程中调用 add()，攒满 batch_size 条才在一个事务里写入，close() 时写出剩余部分。
+    SQLite 中同一源文件只保留最新一次导出。"""
+
+    def __init__(self, jsonl_path=None, db_path=None, batch_size=200):
+        self.batch_size = batch_size
+        self.pending = []
+        self.count = 0
+        for path in (jsonl_path, db_path):
+            if path:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.jsonl = open(jsonl_path, "a", encoding="utf-8") if jsonl_path else None
+        self.conn = None
+        if db_path:
+            self.conn = sqlite3.connect(db_path)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(EXPORT_SCHEMA)
+
+    def add(self, source_path, fields):
+        self.pending.append((os.path.abspath(source_path), fields))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        now = time.time()
+        if self.jsonl:
+            self.jsonl.write("".join(
+                json.dumps({'source_path': path, **fields, 'exported_at': now}, ensure_ascii=False) + "\n"
+                for path, fields in self.pending
+            ))
+            self.jsonl.flush()
+        if self.conn:
+            columns = ", ".join(EXPORT_FIELDS)
+            placeholders = ", ".join("?" * len(EXPORT_FIELDS))
+            with self.conn:
+                for path, fields in self.pending:
+                    values = [fields.get(name) or "" for name in EXPORT_FIELDS]
+                    old = self.conn.execute("SELECT id FROM judgments WHERE source_path = ?", (path,)).fetchone()
+                    if old:
+                        rowid = old[0]
+                        self.conn.execute(
+                            f"UPDATE judgments SET ({columns}, exported_at) = ({placeholders}, ?) WHERE id = ?",
+                            values + [now, rowid])
+                        self.conn.execute("DELETE FROM judgments_fts WHERE rowid = ?", (rowid,))
+                    else:
+                        rowid = self.conn.execute(
+                            f"INSERT INTO judgments (source_path, {columns}, exported_at)"
+                            f" VALUES (?, {placeholders}, ?)",
+                            [path] + values + [now]).lastrowid
+                    self.conn.execute(
+                        f"INSERT INTO judgments_fts (rowid, {columns}) VALUES (?, {placeholders})",
+                        [rowid] + [fts_tokens(value) for value in values])
+        self.count += len(self.pending)
+        self.pending = []
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            if self.jsonl:
+                self.jsonl.close()
+            if self.conn:
+                self.conn.close()
+
+
+def search_judgments(db_path, query, field=None, limit=20):
+    """在导出库中全文检索，按相关度返回 [{source_path, case_name, case_number, snippet}]。
+    field 给出时只在该字段（如 judge_info、parties_info、trial_analysis）中检索。"""
+    if field is not None and field not in EXPORT_FIELDS:
+        raise ValueError(f"未知字段：{field}（可选：{', '.join(EXPORT_FIELDS)}）")
+    column = -1 if field is None else EXPORT_FIELDS.index(field)
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute(
+            "SELECT j.source_path, j.case_name, j.case_number,"
+            " snippet(judgments_fts, ?, '【', '】', '…', 24)"
+            " FROM judgments_fts JOIN judgments j ON j.id = judgments_fts.rowid"
+            " WHERE judgments_fts MATCH ? ORDER BY rank LIMIT ?",
+            (column, fts_query(query, field), limit),
+        ).fetchall()
+    finally:
+        conn.close()
+    return [{'source_path': path, 'case_name': name, 'case_number': number, 'snippet': _fts_untokenize(snippet)}
+            for path, name, number, snippet in rows]
+
+# ---------------- ZIP 压缩包输入/输出 ----------------
+
+# 压缩包内的文书用“压缩包路径!/包内路径”表示，不解压到磁盘，转换时在内存中读出
+ZIP_MEMBER_SEP = "!/"
+# 每个进程最多同时保持打开的输入压缩包数
+ZIP_ARCHIVES_OPEN_MAX = 8
+
+
+def is_zip_member(path):
+    return ZIP_MEMBER_SEP in path
+
+
+def split_zip_member(path):
+    """“a.zip!/b/c.docx” -> ("a.zip", "b/c.docx")；普通路径返回 (path, None)"""
+    archive, sep, member = path.partition(ZIP_MEMBER_SEP)
+    return (archive, member) if sep else (path, None)
+
+
+def _zip_member_name(info):
+    """包内文件名：没有 UTF-8 标记的依次按 UTF-8、GBK 解码（国内常用的压缩工具按 GBK 存文件名）"""
+    if info.flag_bits & 0x800:
+        return info.filename
+    raw = info.filename.encode("cp437")
+    for encoding in ("utf-8", "gbk"):
+        try:
+            return raw.decode(encoding)
+        except UnicodeDecodeError:
+            pass
+    return info.filename
+
+
+_zip_archives = {}
+
+
+def _open_zip(zip_path):
+    """每个进程对同一压缩包只打开、读取一次中央目录，返回 (ZipFile, {包内文件名: ZipInfo})。
+    压缩包被替换（大小或修改时间变化）时重新打开。"""
+    st = os.stat(zip_path)
+    key = os.path.realpath(zip_path)
+    entry = _zip_archives.pop(key, None)
+    if entry is not None and entry[0] != (st.st_size, st.st_mtime_ns):
+        entry[1].close()
+        entry = None
+    if entry is None:
+        zf = zipfile.ZipFile(zip_path)
+        entry = ((st.st_size, st.st_mtime_ns), zf, {_zip_member_name(info): info for info in zf.infolist()})
+        while len(_zip_archives) >= ZIP_ARCHIVES_OPEN_MAX:
+            _zip_archives.pop(next(iter(_zip_archives)))[1].close()
+    _zip_archives[key] = entry   # 移到最近使用
+    return entry[1], entry[2]
+
+
+def iter_zip_members(zip_path):
+    """列出压缩包内的 DOCX/PDF（跳过目录、Word 临时文件 ~$xxx 和 __MACOSX 附带文件），按包内顺序"""
+    for name, info in _open_zip(zip_path)[1].items():
+        base = posixpath.basename(name)
+        if info.is_dir() or base.startswith(("~$", "._")) or name.startswith("__MACOSX/"):
+            continue
+        if os.path.splitext(base)[1].lower() in SUPPORTED_EXTS:
+            yield zip_path + ZIP_MEMBER_SEP + name
+
+
+def read_zip_member(path):
+    """在内存中读出压缩包内一篇文书的全部内容（bytes）"""
+    zip_path, member = split_zip_member(path)
+    zf, members = _open_zip(zip_path)
+    info = members.get(member)
+    if info is None:
+        raise FileNotFoundError(f"压缩包中没有该文件：{path}")
+    return zf.read(info)
+
+
+def _unique_name(name, names):
+    """name 已在 names 中时依次加序号 (2)、(3)…… 直到不重名，记入 names 并返回"""
+    stem, ext = os.path.splitext(name)
+    unique = name
+    for n in itertools.count(2):
+        if unique not in names:
+            break
+        unique = f"{stem}({n}){ext}"
+    names.add(unique)
+    return unique
+
+
+class HtmlZipWriter:
+    """在主进程中把转换出的 HTML 逐个写进一个输出 ZIP，代替成千上万个单独的 HTML 文件。
+    先写到 <zip_path>.part，close() 时改名；批量处理中途出错或被中断时调用 abort() 删掉 .part，
+    不会留下看似完整的半截 ZIP。包内重名时加序号区分：事先用 reserve() 登记的输入按 html_output_names
+    分配，与处理完成的先后无关。
+    接口同 HtmlFileWriter：每篇写进 ZIP 后调用 on_done(result)（在调用 add() 的线程中）。"""
+
+    def __init__(self, zip_path, on_done=None):
+        self.zip_path = zip_path
+        self.on_done = on_done
+        self.count = 0
+        self._names = set()
+        self._planned = {}
+        os.makedirs(os.path.dirname(os.path.abspath(zip_path)), exist_ok=True)
+        self._zf = zipfile.ZipFile(zip_path + ".part", "w", zipfile.ZIP_DEFLATED)
+
+    def reserve(self, paths):
+        """预先为这批输入分配包内文件名（见 html_output_names），add() 时按输入路径取用"""
+        self._planned.update(html_output_names(paths, self._names))
+
+    def add(self, result):
+        """写入 result['html']（随后从 result 中移除），result['html_path'] 改为“输出 ZIP!/包内文件名”"""
+        name = self._planned.pop(result['path'], None) or _unique_name(result['html_path'], self._names)
+        self._zf.writestr(name, result.pop('html'))
+        result['html_path'] = self.zip_path + ZIP_MEMBER_SEP + name
+        self.count += 1
+        if self.on_done:
+            self.on_done(result)
+
+    def close(self):
+        self._zf.close()
+        os.replace(self.zip_path + ".part", self.zip_path)
+
+    def abort(self):
+        """放弃这个输出 ZIP：删掉 .part，不改名为 zip_path"""
+        try:
+            self._zf.close()
+        finally:
+            with contextlib.suppress(OSError):
+                os.remove(self.zip_path + ".part")
+        logger.warning("批量处理未完成，未生成输出 ZIP：%s", self.zip_path)
+
+# ---------------- 输出 HTML 写入 ----------------
+
+# 写入线程前最多排队的 HTML 篇数，排满时 add() 阻塞，不会无限占用主进程内存
+OUTPUT_QUEUE_MAX = 64
+# 攒够这么多篇，或最早一篇已等待这么多秒，就统一 fsync 一次再改名到最终文件名
+OUTPUT_FSYNC_BATCH = 32
+OUTPUT_FSYNC_INTERVAL = 1.0
+
+
+def _fsync_dir(path):
+    """让目录中的改名落盘；Windows 无法打开目录，跳过"""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class HtmlFileWriter:
+    """在主进程的后台线程里把转换出的 HTML 写进输出目录，与工作进程解析后面的文书同时进行。
+    接口同 HtmlZipWriter，同一批内重名时同样加序号区分。每篇先写到 <文件名>.<序号>.part，成批 fsync 后再改名为最终文件名，
+    中途中断只会留下 .part，不会留下半截的 HTML；close() 写完剩余部分。
+    每篇改名到最终文件名后，或写入失败时（ok 改为 False，error 注明原因），在写入线程中调用 on_done(result)：
+    在此之前不应报告该篇成功。on_done 抛出异常时该篇改记为失败，写入线程照常处理后面的文件。"""
+
+    def __init__(self, output_dir, on_done=None, fsync=True, max_pending=OUTPUT_QUEUE_MAX,
+                 fsync_batch=OUTPUT_FSYNC_BATCH, fsync_interval=OUTPUT_FSYNC_INTERVAL):
+        import queue
+        self.output_dir = output_dir
+        self.on_done = on_done
+        self.fsync = fsync
+        self.fsync_batch = fsync_batch
+        self.fsync_interval = fsync_interval
+        self.count = 0
+        # 同一批里可能有重名的输出（如同名的 DOCX 和 PDF），最终文件名加 (2)、(3)…… 区分
+        self._names = set()
+        self._planned = {}
+        self._seq = itertools.count()
+        self._queue = queue.Queue(max_pending)
+        self._empty = queue.Empty
+        os.makedirs(output_dir, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="html-writer", daemon=True)
+        self._thread.start()
+
+    def reserve(self, paths):
+        """预先为这批输入分配输出文件名（见 html_output_names），add() 时按输入路径取用"""
+        self._planned.update(html_output_names(paths, self._names))
+
+    def add(self, result):
+        """排队写入 result['html']（随后从 result 中移除），result['html_path'] 改为输出目录下的完整路径（重名时已加序号）"""
+        name = self._planned.pop(result['path'], None) or _unique_name(result['html_path'], self._names)
+        result['html_path'] = os.path.join(self.output_dir, name)
+        self._queue.put((result, result.pop('html')))
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def abort(self):
+        """中止时已排队的照常写完：每篇都是完整的文件，没有要丢弃的部分"""
+        self.close()
+
+    def _run(self):
+        pending = []        # [(result, .part 文件)]，等待 fsync 和改名
+        first = 0.0
+        while True:
+            timeout = max(first + self.fsync_interval - time.monotonic(), 0) if pending else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except self._empty:
+                item = ()
+            if item:
+                result, html = item
+                if not pending:
+                    first = time.monotonic()
+                part = f"{result['html_path']}.{next(self._seq)}.part"
+                try:
+                    f = open(part, "w", encoding="utf-8")
+                    try:
+                        f.write(html)
+                        f.flush()
+                    except BaseException:
+                        f.close()
+                        raise
+                    pending.append((result, f))
+                except Exception as e:
+                    self._fail(result, part, e)
+            # item 为 None 表示 close()，为 () 表示等满了 fsync_interval
+            if pending and (not item or len(pending) >= self.fsync_batch
+                            or time.monotonic() - first >= self.fsync_interval):
+                self._commit(pending)
+                pending = []
+            if item is None:
+                return
+
+    def _commit(self, pending):
+        written = []
+        for result, f in pending:
+            part = f.name
+            try:
+                try:
+                    if self.fsync:
+                        os.fsync(f.fileno())
+                finally:
+                    f.close()
+                os.replace(part, result['html_path'])
+                written.append(result)
+                self.count += 1
+            except Exception as e:
+                self._fail(result, part, e)
+        if written and self.fsync:
+            try:
+                _fsync_dir(self.output_dir)
+            except OSError as e:
+                logger.warning("输出目录 fsync 失败：%s", e)
+        for result in written:
+            self._notify(result)
+
+    def _fail(self, result, part, error):
+        with contextlib.suppress(OSError):
+            os.remove(part)
+        result.update(ok=False, error=f"写入输出失败：{type(error).__name__}: {error}")
+        logger.error("处理失败：%s（%s）", result['path'], result['error'])
+        self._notify(result)
+
+    def _notify(self, result):
+        """调用 on_done。回调出错时写入线程不能退出（否则之后的 add()/close() 会一直阻塞）：
+        该篇改记为失败再通知一次，仍然出错就只记日志"""
+        if not self.on_done:
+            return
+        try:
+            self.on_done(result)
+            return
+        except Exception as e:
+            logger.exception("输出回调出错：%s", result['path'])
+            if not result['ok']:
+                return
+            result.update(ok=False, error=f"输出回调出错：{type(e).__name__}: {e}")
+        try:
+            self.on_done(result)
+        except Exception:
+            logger.exception("输出回调出错：%s", result['path'])
+
+# ---------------- 单文件转换 ----------------
+
+def html_output_path(path, output_dir):
+    base_name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(output_dir, f"{base_name}-公众号格式.html")
+
+
+def html_output_names(paths, taken=None):
+    """为一批输入分配输出 HTML 的文件名，返回 {输入路径: 文件名}。
+    输出同名的输入（如 a.docx 和 a.pdf）按路径排序（不分大小写），第一个用原名，其余依次加 (2)、(3)……：
+    同一组输入每次得到相同的文件名，与处理完成的先后无关。taken 为已占用的文件名集合，分配的名字随之记入。"""
+    taken = set() if taken is None else taken
+    return {path: _unique_name(os.path.basename(html_output_path(path, "")), taken)
+            for path in sorted(set(paths), key=lambda p: (p.lower(), p))}
+
+
+def extract_document(source, ext, trace, dump_path=None, pdf_parallel_pages=DEFAULT_PDF_PARALLEL_PAGES):
+    """提取一篇文书的文本，返回 (正文, 案号, parse)，调用 parse() 得到字段 dict。
+    source 为路径或文件内容（bytes），ext 为 .docx/.pdf；dump_path、pdf_parallel_pages 只对 PDF 有效。"""
+    if ext == ".docx":
+        if isinstance(source, (bytes, bytearray)):
+            source = io.BytesIO(source)
+        with trace.stage("docx_extract"):
+            judgment = load_docx(source)
+        trace.record['paragraphs'] = len(judgment.texts)
+        full_text, case_number = judgment.full_text, judgment.case_number
+        return full_text, case_number, functools.partial(parse_fields, full_text, judgment.case_name, case_number)
+    with trace.stage("pdf_extract"):
+        lines_no_spaces, full_text = extract_pdf_text(source, dump_path, trace.record, pdf_parallel_pages)
+    trace.record['paragraphs'] = full_text.count("\n") + 1 if full_text else 0
+    return (full_text, pdf_case_number(lines_no_spaces),
+            functools.partial(extract_text_from_txt, lines_no_spaces, full_text))
+
+
+def parse_document(source, ext, trace, dump_path=None, pdf_parallel_pages=DEFAULT_PDF_PARALLEL_PAGES):
+    """提取并解析一篇文书，返回字段 dict（参数同 extract_document）"""
+    _, _, parse = extract_document(source, ext, trace, dump_path, pdf_parallel_pages)
+    with trace.stage("parse"):
+        return parse()
+
+
+@contextlib.contextmanager
+def html_writer(f, base_dir, max_inline_image_bytes, record):
+    """包装输出流 f。max_inline_image_bytes 非 0 时写入内容经过图片内联：
+    相对 base_dir 的本地 <img> 换成 data URI，内联统计记入 record"""
+    if not max_inline_image_bytes:
+        yield f
+        return
+    stats = defaultdict(int)
+    writer = ImageInliningWriter(f, base_dir, get_image_inliner(max_inline_image_bytes), stats)
+    yield writer
+    writer.close()
+    record.update(stats)
+
+
+@contextlib.contextmanager
+def open_html_output(html_path, base_dir, max_inline_image_bytes, record):
+    """打开输出 HTML，写入方式同 html_writer。先写到 <html_path>.part，写完才改名，
+    出错或中断时不会留下半截的 HTML"""
+    part = html_path + ".part"
+    try:
+        with open(part, "w", encoding="utf-8") as f:
+            with html_writer(f, base_dir, max_inline_image_bytes, record) as writer:
+                yield writer
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(part)
+        raise
+    os.replace(part, html_path)
+
+
+def convert_file(path, output_dir, debug_dumps=False, use_cache=True,
+                 cache_max_bytes=DEFAULT_CACHE_MAX_BYTES, trace=None,
+                 pdf_parallel_pages=DEFAULT_PDF_PARALLEL_PAGES, return_fields=False,
+                 max_inline_image_bytes=DEFAULT_MAX_INLINE_IMAGE_BYTES, html_in_result=False,
+                 dedup=None, dedup_threshold=DEFAULT_DEDUP_THRESHOLD, html_dir=None, html_name=None):
+    """转换单个 DOCX/PDF 文书并写出公众号 HTML；失败时抛出异常。
+    path 也可以是压缩包内的文书（“a.zip!/b.docx”），在内存中读出，不解压到磁盘。
+    返回 {'html_path': ..., 'cached': 是否命中缓存}，return_fields 为真时另含解析字段 'fields'。
+    命中缓存时完全跳过 python-docx/PyMuPDF。
+    trace 给出时把各阶段耗时和规模记入其中。
+    页数不少于 pdf_parallel_pages 的 PDF 分片并行提取文本（0 表示不分片）。
+    HTML 中引用的本地图片（相对输入文件所在目录）不超过 max_inline_image_bytes 时内联为 base64，
+    0 表示不内联。
+    html_in_result 为真时不写文件，HTML 放在 'html' 中返回，'html_path' 只含文件名
+    （由主进程用 HtmlFileWriter/HtmlZipWriter 写出）。
+    dedup 为 "flag"/"skip" 时，提取文本后先查输出目录下的近似重复索引：与已转换过的文书重复的，
+    结果中给出 'duplicate_of'、'similarity'；"skip" 时不再解析和排版，返回 'skipped': True、'html_path': None。
+    html_dir 给出时 HTML 写到该目录（不存在时创建），缓存、查重索引和调试文本仍在 output_dir 下；
+    html_name 给出时用作输出文件名（见 html_output_names）。"""
+    trace = trace or DocTrace(path)
+    ext = os.path.splitext(path)[1].lower()
+    base_name = os.path.splitext(os.path.basename(path))[0]
+    if ext not in SUPPORTED_EXTS:
+        raise ValueError(f"非支持文件格式：{os.path.basename(path)}")
+    if html_dir:
+        os.makedirs(html_dir, exist_ok=True)
+    if html_name:
+        html_path = os.path.join(html_dir or output_dir, html_name)
+    else:
+        html_path = html_output_path(path, html_dir or output_dir)
+    if is_zip_member(path):
+        with trace.stage("zip_read"):
+            source = read_zip_member(path)
+        # 包内文书引用的相对路径图片按压缩包所在目录解析
+        base_dir = os.path.dirname(os.path.abspath(split_zip_member(path)[0]))
+        trace.record['input_bytes'] = len(source)
+    else:
+        source = path
+        base_dir = os.path.dirname(os.path.abspath(path))
+        trace.record['input_bytes'] = os.path.getsize(path)
+
+    cache = get_result_cache(output_dir, cache_max_bytes) if use_cache else None
+    hit = None
+    digest = None
+    if cache:
+        with trace.stage("cache_lookup"):
+            digest = hashlib.sha256(source).hexdigest() if source is not path else file_sha256(path)
+            cache_key = ResultCache.key_for(digest)
+            # 需要调试文本时必须真正解析一遍
+            hit = cache.get(cache_key) if not debug_dumps else None
+    trace.record['cached'] = hit is not None
+
+    found = None
+    signature = None
+    if hit is None:
+        dump_path = os.path.join(output_dir, f"{base_name}_debug.txt") if debug_dumps else None
+        text, case_number, parse = extract_document(source, ext, trace, dump_path, pdf_parallel_pages)
+    elif dedup:
+        # 命中缓存时用缓存的签名查重；未开启查重时存入的条目没有签名，提取一次文本补上
+        stored = cache.get_signature(cache_key)
+        if stored is None:
+            text, case_number, _ = extract_document(source, ext, trace, None, pdf_parallel_pages)
+        else:
+            case_number, signature = stored
+    if dedup:
+        with trace.stage("dedup"):
+            if signature is None:
+                signature = text_fingerprint(text)
+                if hit is not None:
+                    cache.set_signature(cache_key, case_number, signature)
+            found = get_dedup_index(output_dir).check_and_add(path, case_number, signature, dedup_threshold, digest)
+    duplicate = {}
+    if found:
+        duplicate = {'duplicate_of': found[0], 'similarity': round(found[1], 3)}
+        trace.record.update(duplicate)
+        if dedup == "skip":
+            return {'html_path': None, 'cached': hit is not None, 'skipped': True, **duplicate}
+
+    if hit is not None:
+        data, html = hit
+    else:
+        with trace.stage("parse"):
+            data = parse()
+        logger.debug("judge_info: %r", data['judge_info'])
+        logger.debug("parties_info: %r", data['parties_info'])
+        if not cache and not html_in_result:
+            # 不需要缓存整篇 HTML 时直接边渲染边写文件
+            with trace.stage("render_write"):
+                with open_html_output(html_path, base_dir, max_inline_image_bytes, trace.record) as f:
+                    write_wechat_html(data, f)
+            result = {'html_path': html_path, 'cached': False, **duplicate}
+            if return_fields:
+                result['fields'] = data
+            return result
+        with trace.stage("render"):
+            html = generate_wechat_html(data)
+        if cache:
+            with trace.stage("cache_store"):
+                cache.put(cache_key, data, html, signature, case_number)
+
+    if html_in_result:
+        with trace.stage("write"):
+            buf = io.StringIO()
+            with html_writer(buf, base_dir, max_inline_image_bytes, trace.record) as f:
+                f.write(html)
+        result = {'html_path': os.path.basename(html_path), 'html': buf.getvalue(), 'cached': hit is not None,
+                  **duplicate}
+    else:
+        with trace.stage("write"):
+            with open_html_output(html_path, base_dir, max_inline_image_bytes, trace.record) as f:
+                f.write(html)
+        result = {'html_path': html_path, 'cached': hit is not None, **duplicate}
+    trace.record['output_chars'] = len(html)
+    if return_fields:
+        result['fields'] = data
+    return result
+
+# ---------------- 单个文书的时间/内存预算 ----------------
+
+# 单个文书的处理时间上限（秒）和处理期间工作进程常驻内存增长上限（MB），0 表示不限
+DEFAULT_DOC_TIME_BUDGET = 120
+DEFAULT_DOC_MEMORY_BUDGET = 1024
+# 超出时间预算后再等多久（秒）仍未结束的，由主进程终止该工作进程（卡在不释放 GIL 的 C 代码里时，
+# 工作进程自己的监视线程也无法运行）
+BUDGET_KILL_GRACE = 10
+# 工作进程异常退出时正在处理的文书，累计遇到几次就判定为失败、不再重试
+WORKER_CRASH_RETRIES = 2
+# 进程池连续损坏、期间没有任何文书完成也没有查出是谁导致的（例如工作进程在初始化时就崩溃），
+# 未开始处理的文书最多重试几次
+POOL_BROKEN_RETRIES = 3
+_BUDGET_POLL_INTERVAL = 0.2
+# 只在本进程内由 _thread.interrupt_main 模拟触发，不占用 Ctrl+C（监视模式的子进程会忽略 SIGINT）
+_BUDGET_SIGNAL = getattr(signal, "SIGUSR1", None) or getattr(signal, "SIGBREAK", None)
+
+
+class BudgetExceeded(Exception):
+    """单个文书超出时间或内存预算，stage 为当时所在的处理阶段"""
+
+    def __init__(self, kind, stage, limit):
+        super().__init__(f"阶段 {stage or '未知'} 超出{kind}预算（{limit}）")
+        self.kind = kind
+        self.stage = stage
+
+
+_process_memory_counters = None
+
+
+def current_rss():
+    """本进程当前的常驻内存（字节）；macOS 等只能取到峰值，取不到时返回 0"""
+    global _process_memory_counters
+    if sys.platform.startswith("linux"):
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    if sys.platform.startswith("win"):
+        import ctypes
+        from ctypes import wintypes
+        if _process_memory_counters is None:
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + [
+                    (name, ctypes.c_size_t) for name in (
+                        "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage", "QuotaPagedPoolUsage",
+                        "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage")]
+            _process_memory_counters = PROCESS_MEMORY_COUNTERS
+        counters = _process_memory_counters()
+        counters.cb = ctypes.sizeof(counters)
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(
+                ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+            return 0
+        return counters.WorkingSetSize
+    try:
+        import resource
+    except ImportError:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class DocBudget:
+    """在工作进程里监视正在处理的文书。后台线程定时检查耗时和常驻内存增长，超出预算时
+    向主线程发信号，在当前阶段抛出 BudgetExceeded，本进程接着处理后面的文书。
+    信号要等主线程回到 Python 代码才会处理；卡在 C 代码里不返回的由主进程的 WorkerMonitor 终止，
+    为此 reports 给出时把每个文书的开始和所进入的阶段报告给主进程。"""
+
+    def __init__(self, reports=None):
+        self.reports = reports
+        self._lock = threading.RLock()
+        self._wake = threading.Event()
+        self._doc = None
+        self._exceeded = None
+        # 信号处理函数只能在主线程注册；在其他线程里创建时不做软中断
+        self._enabled = _BUDGET_SIGNAL is not None and threading.current_thread() is threading.main_thread()
+        if self._enabled:
+            signal.signal(_BUDGET_SIGNAL, self._on_signal)
+            threading.Thread(target=self._watch, name="doc-budget", daemon=True).start()
+
+    @contextlib.contextmanager
+    def watch(self, path, trace, time_budget=DEFAULT_DOC_TIME_BUDGET, memory_budget=DEFAULT_DOC_MEMORY_BUDGET):
+        """在 with 块内处理 path，trace.current_stage 用于报告超出预算的阶段"""
+        if self.reports is not None:
+            pid = os.getpid()
+            self.reports.put(("start", pid, path))
+            trace.on_stage = lambda name: self.reports.put(("stage", pid, name))
+        base_rss = current_rss() if memory_budget else 0
+        with self._lock:
+            self._doc = (trace, time_budget, memory_budget, time.monotonic(), base_rss)
+            self._exceeded = None
+        self._wake.set()
+        try:
+            yield
+        finally:
+            trace.on_stage = None
+            with self._lock:
+                self._doc = None
+
+    def _on_signal(self, signum, frame):
+        with self._lock:
+            if self._doc is None or self._exceeded is None:
+                return
+            exceeded, self._exceeded = self._exceeded, False
+        raise BudgetExceeded(*exceeded)
+
+    def _watch(self):
+        while True:
+            doc = self._doc
+            self._wake.wait(_budget_poll_interval(doc[1]) if doc is not None else None)
+            self._wake.clear()
+            with self._lock:
+                # _exceeded 为 False 表示本文书已经打断过一次
+                if self._doc is None or self._exceeded is not None:
+                    continue
+                trace, time_budget, memory_budget, start, base_rss = self._doc
+                if time_budget and time.monotonic() - start > time_budget:
+                    self._exceeded = ("时间", trace.current_stage, f"{time_budget:g}s")
+                elif memory_budget and current_rss() - base_rss > memory_budget * 1024 * 1024:
+                    self._exceeded = ("内存", trace.current_stage, f"{memory_budget}MB")
+                else:
+                    continue
+            _thread.interrupt_main(_BUDGET_SIGNAL)
+
+
+def _budget_poll_interval(time_budget):
+    """预算检查间隔：不超过 _BUDGET_POLL_INTERVAL，也不超过时间预算的 1/4，很短的预算同样能按时生效"""
+    return min(_BUDGET_POLL_INTERVAL, time_budget / 4) if time_budget else _BUDGET_POLL_INTERVAL
+
+
+def _kill_process(pid):
+    try:
+        os.kill(pid, getattr(signal, "SIGKILL", signal.SIGTERM))
+    except OSError:
+        pass
+
+
+class WorkerMonitor:
+    """主进程一侧：接收工作进程（DocBudget）报告的当前文书和阶段，超出时间预算
+    BUDGET_KILL_GRACE 秒后仍未结束的直接终止该进程。进程池因此（或因崩溃）损坏后，
+    用 verdict() 判断每个未完成的文书应判为失败还是换新进程池重试。
+    context 为进程池所用的 multiprocessing 上下文（不给出时用默认的启动方式）。"""
+
+    def __init__(self, time_budget=DEFAULT_DOC_TIME_BUDGET, context=None):
+        self.time_budget = time_budget
+        self.reports = (context or multiprocessing).SimpleQueue()
+        self._lock = threading.Condition()
+        self._running = {}          # pid -> [path, 开始时间, 阶段]
+        self._finished_early = Counter()
+        self._killed = {}
+        # 终止某个工作进程时其他进程正在处理的文书，进程池随之损坏，但不算它们的崩溃
+        self._bystanders = set()
+        self._crashes = Counter()
+        # 有文书完成或查明了损坏原因时加一；path -> (连续无法解释的损坏次数, 当时的 _progress)
+        self._progress = 0
+        self._unexplained = {}
+        self._sync_seq = self._sync_seen = 0
+        self._closed = threading.Event()
+        threading.Thread(target=self._drain, name="worker-monitor", daemon=True).start()
+        if time_budget:
+            threading.Thread(target=self._watch, name="worker-watchdog", daemon=True).start()
+
+    def _drain(self):
+        for message in iter(self.reports.get, None):
+            kind = message[0]
+            with self._lock:
+                if kind == "start":
+                    _, pid, path = message
+                    if self._finished_early[path]:
+                        # 结果比开始报告先到
+                        self._finished_early[path] -= 1
+                        self._running.pop(pid, None)
+                    else:
+                        self._running[pid] = [path, time.monotonic(), None]
+                elif kind == "stage":
+                    entry = self._running.get(message[1])
+                    if entry:
+                        entry[2] = message[2]
+                else:
+                    self._sync_seen = message[1]
+                    self._lock.notify_all()
+
+    def _watch(self):
+        while not self._closed.wait(0.5):
+            deadline = time.monotonic() - self.time_budget - BUDGET_KILL_GRACE
+            with self._lock:
+                stuck = [(pid, entry) for pid, entry in self._running.items() if entry[1] < deadline]
+                for pid, (path, _, stage) in stuck:
+                    del self._running[pid]
+                    self._killed[path] = (f"{BudgetExceeded('时间', stage, f'{self.time_budget:g}s')}，"
+                                          f"无法中断，工作进程已终止")
+                if stuck:
+                    self._bystanders.update(entry[0] for entry in self._running.values())
+            for pid, (path, _, _) in stuck:
+                logger.warning("终止工作进程 %s：%s", pid, self._killed.get(path))
+                _kill_process(pid)
+
+    def finished(self, path):
+        with self._lock:
+            self._progress += 1
+            self._bystanders.discard(path)
+            for pid, entry in self._running.items():
+                if entry[0] == path:
+                    del self._running[pid]
+                    return
+            self._finished_early[path] += 1
+
+    def sync(self):
+        """等已经写进队列的报告都处理完"""
+        with self._lock:
+            self._sync_seq += 1
+            seq = self._sync_seq
+        self.reports.put(("sync", seq))
+        with self._lock:
+            self._lock.wait_for(lambda: self._sync_seen >= seq, timeout=5)
+
+    def verdicts(self, paths):
+        """进程池损坏后对未完成的 paths 返回 {path: 失败原因}，None 表示可以重试。
+        损坏时正在处理、又不是因为别的文书超时被终止而受牵连的，记为一次崩溃嫌疑。
+        还没开始处理的，在期间既无文书完成、也查不出原因的情况下连续损坏 POOL_BROKEN_RETRIES 次即判为失败，
+        不会无休止地重建进程池。"""
+        self.sync()
+        result = {}
+        with self._lock:
+            in_flight = set()
+            for pid, entry in list(self._running.items()):
+                if entry[0] in paths:
+                    in_flight.add(entry[0])
+                    del self._running[pid]
+            if in_flight or any(path in self._killed for path in paths):
+                self._progress += 1
+            for path in paths:
+                if path in self._killed:
+                    result[path] = self._killed.pop(path)
+                    continue
+                result[path] = None
+                if path in self._bystanders:
+                    self._bystanders.discard(path)
+                elif path in in_flight:
+                    self._crashes[path] += 1
+                    if self._crashes[path] >= WORKER_CRASH_RETRIES:
+                        result[path] = "工作进程异常退出（可能内存不足或解析库崩溃）"
+                else:
+                    count, seen = self._unexplained.get(path, (0, None))
+                    count = count + 1 if seen == self._progress else 1
+                    self._unexplained[path] = (count, self._progress)
+                    if count >= POOL_BROKEN_RETRIES:
+                        result[path] = "进程池反复损坏，工作进程未能开始处理（可能启动时即崩溃）"
+        return result
+
+    def suspected(self, path):
+        """path 是否在工作进程崩溃时正在处理过"""
+        with self._lock:
+            return self._crashes[path] > 0
+
+    def forget(self, path):
+        """path 已得出最终结果，清除它的崩溃记录（watch/serve 长期运行时避免记录无限增长）"""
+        with self._lock:
+            self._crashes.pop(path, None)
+            self._unexplained.pop(path, None)
+            self._bystanders.discard(path)
+
+    def close(self):
+        self._closed.set()
+        self.reports.put(None)
+
+# ---------------- 批量调度与剩余时间估计 ----------------
+
+# 未校准时的处理耗时（秒/页、秒/KB），只决定最初的排序和剩余时间估计
+DEFAULT_WORK_RATES = {'pdf_page': 0.005, 'pdf_kb': 0.004, 'docx_kb': 0.0005}
+# 默认速度折算成多少单位的实测数据参与平均：前一两个文件不会让估计大起大落
+PRIOR_WORK_UNITS = {'pdf_page': 20, 'pdf_kb': 100, 'docx_kb': 100}
+
+
+def estimate_work(path, count_pages=True):
+    """估计 path 的工作量，返回 (种类, 数量)：PDF 为 ('pdf_page', 页数)，只读 PyMuPDF 的 page_count，
+    不提取文本；DOCX、压缩包内的 PDF 和打不开的 PDF 按文件大小（KB）估计。
+    count_pages 为假时 PDF 也按文件大小估计，不打开文件、不导入 PyMuPDF，只需一次 stat"""
+    ext = os.path.splitext(path)[1].lower()
+    kind = 'pdf_kb' if ext == ".pdf" else 'docx_kb'
+    try:
+        if is_zip_member(path):
+            zip_path, member = split_zip_member(path)
+            return kind, max(_open_zip(zip_path)[1][member].file_size / 1024, 1)
+        size = os.path.getsize(path)
+    except (OSError, KeyError, zipfile.BadZipFile):
+        # 读不到的文件留给转换时报错
+        return kind, 1
+    if ext == ".pdf" and count_pages:
+        try:
+            doc = open_pdf(path)
+        except Exception:
+            return kind, max(size / 1024, 1)
+        try:
+            return 'pdf_page', max(doc.page_count, 1)
+        finally:
+            doc.close()
+    return kind, max(size / 1024, 1)
+
+
+def format_duration(seconds):
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}秒"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes}分{seconds:02d}秒"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}时{minutes:02d}分"
+
+
+class BatchScheduler:
+    """批量转换的调度：按估计耗时从大到小排序（最长处理时间优先，大文件不会拖在最后独自运行），
+    并按已完成文件实测的每页/每 KB 耗时校准，估计剩余时间。只在主进程中使用。
+    count_pages 为假时 PDF 按文件大小而不是页数估计（见 estimate_work），供界面线程使用：
+    拖入上万个文件时不必逐个打开 PDF，速度仍按已完成 PDF 每 KB 的实测耗时校准。"""
+
+    def __init__(self, workers=None, count_pages=True):
+        self.workers = workers or os.cpu_count() or 1
+        self.count_pages = count_pages
+        self._work = {}                       # path -> (种类, 数量)
+        self._seconds = defaultdict(float)    # 各种类已完成文件的实测耗时之和
+        self._units = defaultdict(float)      # 及其工作量之和
+        self._remaining = defaultdict(float)  # 各种类尚未完成的工作量
+        self.pending = 0
+
+    def rate(self, kind):
+        """kind 每单位工作量的估计耗时（秒），实测数据与默认速度加权平均"""
+        prior = PRIOR_WORK_UNITS[kind]
+        return (DEFAULT_WORK_RATES[kind] * prior + self._seconds[kind]) / (prior + self._units[kind])
+
+    def add(self, paths):
+        """登记 paths，返回按估计耗时从大到小排列的新列表（耗时相同时保持原顺序）"""
+        costs = {}
+        for path in paths:
+            work = self._work.get(path)
+            if work is None:
+                work = self._work[path] = estimate_work(path, self.count_pages)
+            self._remaining[work[0]] += work[1]
+            self.pending += 1
+            costs[path] = self.cost(path)
+        return sorted(paths, key=costs.__getitem__, reverse=True)
+
+    def cost(self, path):
+        """已登记的 path 按当前速度估计的处理耗时（秒）"""
+        kind, units = self._work[path]
+        return self.rate(kind) * units
+
+    def finished(self, result):
+        """一个文件处理完毕：从剩余工作量中扣除，实际解析过的成功结果用于校准速度"""
+        work = self._work.get(result['path'])
+        if work is None:
+            return
+        kind, units = work
+        self._remaining[kind] = max(self._remaining[kind] - units, 0.0)
+        self.pending = max(self.pending - 1, 0)
+        if result['ok'] and not result.get('cached') and not result.get('skipped') and result.get('elapsed'):
+            self._seconds[kind] += result['elapsed']
+            self._units[kind] += units
+
+    def eta(self):
+        """剩余文件全部完成还需的估计时间（秒）"""
+        if not self.pending:
+            return 0.0
+        total = sum(self.rate(kind) * units for kind, units in self._remaining.items())
+        return total / min(self.workers, self.pending)
+
+# ---------------- 批量转换（命令行） ----------------
+
+def collect_input_files(inputs, failed=None):
+    """展开命令行传入的文件/目录，目录下递归收集 DOCX/PDF（跳过 Word 临时文件 ~$xxx）。
+    ZIP 压缩包展开为包内的 DOCX/PDF（“a.zip!/b.docx”），不解压。
+    给出 failed 列表时，损坏或读不了的压缩包记为失败结果（格式同 run_batch 的结果）追加到其中，
+    其余输入照常收集；不给出时直接抛出异常。"""
+    files = []
+
+    def add_zip(zip_path):
+        try:
+            files.extend(iter_zip_members(zip_path))
+        except (zipfile.BadZipFile, OSError) as e:
+            if failed is None:
+                raise
+            error = f"无法读取压缩包：{type(e).__name__}: {e}"
+            logger.error("处理失败：%s（%s）", zip_path, error)
+            failed.append({'path': zip_path, 'ok': False, 'html_path': None,
+                           'error': error, 'elapsed': 0.0, 'cached': False})
+
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, dirs, names in os.walk(item):
+                dirs.sort()
+                for name in sorted(names):
+                    if name.startswith("~$"):
+                        continue
+                    ext = os.path.splitext(name)[1].lower()
+                    if ext == ".zip":
+                        add_zip(os.path.join(root, name))
+                    elif ext in SUPPORTED_EXTS:
+                        files.append(os.path.join(root, name))
+        elif os.path.splitext(item)[1].lower() == ".zip" and os.path.isfile(item):
+            add_zip(item)
+        else:
+            files.append(item)
+    return files
+
+
+_doc_budget = None
+
+
+def _init_worker(reports=None, shard_workers=None):
+    """进程池子进程初始化：spawn 方式启动的子进程不会继承主进程的日志配置；
+    启动本进程的文书预算监视，reports 为 WorkerMonitor.reports；
+    shard_workers 为本进程分片提取 PDF 的进程数上限（见 pdf_shard_budget）"""
+    global _doc_budget, _pdf_shard_workers
+    if not logging.getLogger().handlers:
+        setup_logging()
+    _doc_budget = DocBudget(reports)
+    _pdf_shard_workers = shard_workers
+
+
+def _worker_budget():
+    """本进程的文书预算监视，未经 _init_worker 初始化的进程里按需创建"""
+    global _doc_budget
+    if _doc_budget is None:
+        _doc_budget = DocBudget()
+    return _doc_budget
+
+
+def _batch_worker(path, output_dir, time_budget=DEFAULT_DOC_TIME_BUDGET,
+                  memory_budget=DEFAULT_DOC_MEMORY_BUDGET, **options):
+    """进程池中执行的任务：捕获所有异常，只把可序列化的结果传回主进程。
+    超出 time_budget（秒）/memory_budget（MB）时该文件记为失败，错误信息中注明所在阶段。
+    result['metrics'] 为该文件的监测记录（各阶段耗时、页数/段落数、结果）。"""
+    start = time.perf_counter()
+    trace = DocTrace(path)
+    result = {'path': path, 'ok': False, 'html_path': None, 'error': None, 'cached': False}
+    try:
+        with profiling(trace), _worker_budget().watch(path, trace, time_budget, memory_budget):
+            result.update(convert_file(path, output_dir, trace=trace, **options))
+        result['ok'] = True
+        trace.finish('duplicate' if result.get('skipped') else 'ok')
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+        if 'failed_stage' in trace.record and not isinstance(e, BudgetExceeded):
+            result['error'] += f"（阶段 {trace.record['failed_stage']}）"
+        result['traceback'] = traceback.format_exc()
+        trace.finish('failed', result['error'])
+    result['elapsed'] = time.perf_counter() - start
+    result['metrics'] = trace.record
+    return result
+
+
+def run_batch(files, output_dir, jobs=None, on_result=None, scheduler=None, **options):
+    """用进程池并行转换 files，每完成一个文件回调 on_result(result)，返回全部结果。
+    files 按 scheduler（BatchScheduler，不给出时新建一个）估计的耗时从大到小提交，
+    回调 on_result 之前先通知 scheduler，回调中可用 scheduler.eta() 显示剩余时间。
+    options 原样传给 convert_file（如 debug_dumps）。"""
+    os.makedirs(output_dir, exist_ok=True)
+    results = []
+    todo = []
+    for path in files:
+        if os.path.splitext(path)[1].lower() not in SUPPORTED_EXTS:
+            result = {'path': path, 'ok': False, 'html_path': None,
+                      'error': "非支持文件格式，跳过", 'elapsed': 0.0, 'cached': False}
+            results.append(result)
+            if on_result:
+                on_result(result)
+        else:
+            todo.append(path)
+    scheduler = scheduler or BatchScheduler(jobs)
+    todo = scheduler.add(todo)
+
+    monitor = WorkerMonitor(options.get('time_budget', DEFAULT_DOC_TIME_BUDGET)) if todo else None
+    try:
+        while todo:
+            # 工作进程被终止（超出预算）或崩溃时整个进程池随之损坏，未完成的文件换新进程池重试；
+            # 有崩溃嫌疑的文书先单独用一个工作进程逐个重试，再次崩溃时就能确定是哪一篇
+            suspects = [path for path in todo if monitor.suspected(path)]
+            batch = suspects or todo
+            broken = set()
+            workers = 1 if suspects else jobs
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(monitor.reports, pdf_shard_budget(workers))) as pool:
+                futures = {}
+                for path in batch:
+                    try:
+                        futures[pool.submit(_batch_worker, path, output_dir, **options)] = path
+                    except BrokenProcessPool:
+                        # 提交途中进程池就已损坏：没提交上的与其余未完成的一样处理
+                        broken.update(batch[len(futures):])
+                        break
+                for future in as_completed(futures):
+                    path = futures[future]
+                    try:
+                        result = future.result()
+                    except BrokenProcessPool:
+                        broken.add(path)
+                        continue
+                    monitor.finished(path)
+                    scheduler.finished(result)
+                    results.append(result)
+                    if on_result:
+                        on_result(result)
+            verdicts = monitor.verdicts(broken) if broken else {}
+            remaining, todo = todo, []
+            for path in remaining:
+                if path in batch and path not in broken:
+                    continue
+                error = verdicts.get(path)
+                if error is None:
+                    todo.append(path)
+                    continue
+                logger.error("处理失败：%s（%s）", path, error)
+                result = {'path': path, 'ok': False, 'html_path': None,
+                          'error': error, 'elapsed': 0.0, 'cached': False}
+                scheduler.finished(result)
+                results.append(result)
+                if on_result:
+                    on_result(result)
+    finally:
+        if monitor:
+            monitor.close()
+    return results
+
+
+def _print_result(result):
+    if result.get('skipped'):
+        print(f"⏭ {result['path']}：与 {result['duplicate_of']} 重复（相似度 {result['similarity']:.2f}），跳过",
+              flush=True)
+    elif result['ok']:
+        cached = "，缓存" if result['cached'] else ""
+        duplicate = f"，与 {result['duplicate_of']} 重复" if result.get('duplicate_of') else ""
+        print(f"✅ {result['path']} -> {result['html_path']} （{result['elapsed']:.2f}s{cached}{duplicate}）", flush=True)
+    else:
+        print(f"❌ {result['path']}：{result['error']}", flush=True)
@@ -0,0 +1,496 @@
+"""拖放转换窗口（PyQt5）。解析在进程池中进行，见 judgment_core。"""
+
+import sys
+import os
+import subprocess
+import traceback
+import time
+import threading
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from PyQt5.QtWidgets import (
+    QApplication, QWidget, QVBoxLayout, QHBoxLayout, QListView, QLabel, QFileDialog, QPushButton,
+    QSpacerItem, QSizePolicy, QProgressBar, QComboBox, QCheckBox
+)
+from PyQt5.QtCore import (
+    Qt, QObject, QRunnable, QThreadPool, QTimer, QAbstractListModel, QModelIndex, pyqtSignal
+)
+
+from judgment_core import (
+    SUPPORTED_EXTS, base_path, logger, setup_logging, log_metrics, pdf_shard_budget, _init_worker, _batch_worker,
+    WorkerMonitor, HtmlFileWriter, HtmlZipWriter, BatchScheduler, format_duration, iter_zip_members, split_zip_member,
+)
+
+# 结果状态
+STATUS_OK, STATUS_FAILED, STATUS_SKIPPED, STATUS_CANCELLED = range(4)
+STATUS_FILTERS = (
+    ("全部", None),
+    ("成功", STATUS_OK),
+    ("失败", STATUS_FAILED),
+    ("跳过", STATUS_SKIPPED),
+    ("已取消", STATUS_CANCELLED),
+)
+
+
+class ResultListModel(QAbstractListModel):
+    """处理结果列表的数据模型。
+
+    每条结果只占几个紧凑数组中的一格（状态、耗时用 array，路径用 list，失败原因等附注按需存 dict），
+    显示文本在视图请求可见行时才生成，上万个文件也不会创建上万个列表项。
+    结果先进入待插入队列，由 flush() 成批插入；按状态筛选时只重建一个行号数组。"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.status = array('b')
+        self.elapsed = array('f')
+        self.inputs = []
+        self.outputs = []
+        self.notes = {}
+        self._pending = []
+        self._filter = None
+        self._rows = None    # 筛选后可见的记录号；None 表示不筛选
+
+    # ---- 记录 ----
+
+    def add(self, status, input_path, output_path=None, elapsed=0.0, note=None):
+        self._pending.append((status, input_path, output_path, elapsed, note))
+
+    def has_pending(self):
+        return bool(self._pending)
+
+    def flush(self):
+        """把待插入的记录一次性追加到模型"""
+        if not self._pending:
+            return
+        first = len(self.status)
+        pending, self._pending = self._pending, []
+        visible = [first + i for i, rec in enumerate(pending) if self._filter is None or rec[0] == self._filter]
+        if visible:
+            start = self.rowCount()
+            self.beginInsertRows(QModelIndex(), start, start + len(visible) - 1)
+        for status, input_path, output_path, elapsed, note in pending:
+            if note:
+                self.notes[len(self.status)] = note
+            self.status.append(status)
+            self.elapsed.append(elapsed)
+            self.inputs.append(input_path)
+            self.outputs.append(output_path)
+        if visible:
+            if self._rows is not None:
+                self._rows.extend(visible)
+            self.endInsertRows()
+
+    def record(self, row):
+        """视图行号 -> 记录号"""
+        return row if self._rows is None else self._rows[row]
+
+    def output_path(self, row):
+        rec = self.record(row)
+        return self.outputs[rec] if self.status[rec] == STATUS_OK else None
+
+    def set_status_filter(self, status):
+        self.beginResetModel()
+        self._filter = status
+        self._rows = None if status is None else array('I', (i for i, s in enumerate(self.status) if s == status))
+        self.endResetModel()
+
+    # ---- Qt 模型接口 ----
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.status) if self._rows is None else len(self._rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        rec = self.record(index.row())
+        if role == Qt.DisplayRole:
+            status = self.status[rec]
+            name = os.path.basename(self.inputs[rec])
+            note = self.notes.get(rec)
+            if status == STATUS_OK:
+                return f"✅ 处理成功：{self.outputs[rec]}（{self.elapsed[rec]:.2f}s{'，' + note if note else ''}）"
+            if status == STATUS_FAILED:
+                return f"❌ 处理失败：{name} （{note or ''}）"
+            if status == STATUS_SKIPPED:
+                return f"⏭ {note}，跳过：{name}" if note else f"❌ 非支持文件格式，跳过：{name}"
+            return f"⏹ 已取消：{name}"
+        if role == Qt.ToolTipRole:
+            tip = self.inputs[rec]
+            if rec in self.notes:
+                tip += "\n" + self.notes[rec]
+            return tip
+        return None
+
+
+class ConversionSignals(QObject):
+    finished = pyqtSignal(dict)
+    # 写入线程写完（或写入失败）一篇 HTML
+    written = pyqtSignal(dict)
+
+
+class ConversionTask(QRunnable):
+    """线程池任务：把单个文件交给进程池转换并等待结果，完成后通过信号回到界面线程。
+    真正的解析在子进程里进行，既不受 GIL 限制，也避免 PyMuPDF 在多线程下共用。
+    工作进程超时被终止或崩溃后进程池损坏，由 monitor 判断本文件是失败还是换新进程池重试。"""
+
+    def __init__(self, path, output_dir, options, pool, signals, cancel_event):
+        super().__init__()
+        self.path = path
+        self.output_dir = output_dir
+        self.options = options
+        self.pool = pool
+        self.signals = signals
+        self.cancel_event = cancel_event
+
+    def run(self):
+        if self.cancel_event.is_set():
+            result = {'path': self.path, 'ok': False, 'html_path': None,
+                      'error': "已取消", 'elapsed': 0.0, 'cached': False, 'cancelled': True}
+        else:
+            try:
+                result = self._convert()
+            except Exception as e:
+                # 进程池本身异常（如子进程崩溃），也要回报结果，保证进度能走完
+                result = {'path': self.path, 'ok': False, 'html_path': None,
+                          'error': f"{type(e).__name__}: {e}", 'elapsed': 0.0, 'cached': False,
+                          'traceback': traceback.format_exc()}
+        self.signals.finished.emit(result)
+
+    def _convert(self):
+        while True:
+            executor, monitor = self.pool.get()
+            try:
+                result = executor.submit(_batch_worker, self.path, self.output_dir, **self.options).result()
+            except BrokenProcessPool:
+                self.pool.discard(executor)
+                error = monitor.verdicts({self.path})[self.path]
+                if error is None and not self.cancel_event.is_set():
+                    continue
+                return {'path': self.path, 'ok': False, 'html_path': None,
+                        'error': error or "已取消", 'elapsed': 0.0, 'cached': False,
+                        'cancelled': error is None}
+            monitor.finished(self.path)
+            return result
+
+
+class WorkerPool:
+    """界面共用的进程池和 WorkerMonitor；进程池损坏后丢弃，下次 get() 时新建"""
+
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self.monitor = None
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if self.monitor is None:
+                self.monitor = WorkerMonitor()
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, initializer=_init_worker,
+                    initargs=(self.monitor.reports, pdf_shard_budget(self.max_workers)))
+            return self._executor, self.monitor
+
+    def discard(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            if self.monitor is not None:
+                self.monitor.close()
+                self.monitor = None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+class DropWidget(QWidget):
+    def __init__(self, debug_dumps=False):
+        super().__init__()
+        self.setWindowTitle("自动排版工具")
+        self.setAcceptDrops(True)
+        self.resize(600, 400)
+        layout = QVBoxLayout(self)
+
+        self.label = QLabel("拖入裁判文书DOCX、PDF文件或ZIP压缩包（可多选）", self)
+        self.label.setAlignment(Qt.AlignCenter)
+        layout.addWidget(self.label)
+
+        filter_row = QHBoxLayout()
+        filter_row.addWidget(QLabel("显示：", self))
+        self.status_filter = QComboBox(self)
+        for label, _ in STATUS_FILTERS:
+            self.status_filter.addItem(label)
+        self.status_filter.currentIndexChanged.connect(self.on_filter_changed)
+        filter_row.addWidget(self.status_filter)
+        filter_row.addStretch(1)
+        layout.addLayout(filter_row)
+
+        # 视图只为可见行取数据；行高统一，滚动时不必逐行计算尺寸
+        self.results = ResultListModel(self)
+        self.listView = QListView(self)
+        self.listView.setModel(self.results)
+        self.listView.setUniformItemSizes(True)
+        layout.addWidget(self.listView)
+
+        self.btn_select = QPushButton("手动选择文件", self)
+        layout.addWidget(self.btn_select)
+        self.btn_select.clicked.connect(self.open_file_dialog)
+
+        # 勾选后一批结果写进输出目录下的一个 ZIP，不再逐个生成 HTML 文件
+        self.zip_output = QCheckBox("输出打包为一个 ZIP", self)
+        layout.addWidget(self.zip_output)
+        # 按正文指纹和案号识别同一篇文书的不同副本（如 PDF 与 DOCX），只转换第一份
+        self.skip_duplicates = QCheckBox("跳过重复文书", self)
+        layout.addWidget(self.skip_duplicates)
+
+        self.output_dir = os.path.join(base_path, "output")
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.options = {'debug_dumps': debug_dumps}
+
+        self.listView.doubleClicked.connect(self.open_file)
+
+        progress_row = QHBoxLayout()
+        self.progress = QProgressBar(self)
+        self.progress.setMaximum(1)
+        self.progress.setValue(0)
+        progress_row.addWidget(self.progress)
+        self.btn_cancel = QPushButton("取消", self)
+        self.btn_cancel.setEnabled(False)
+        self.btn_cancel.clicked.connect(self.cancel_processing)
+        progress_row.addWidget(self.btn_cancel)
+        layout.addLayout(progress_row)
+
+        self.status_label = QLabel("", self)
+        layout.addWidget(self.status_label)
+
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(os.cpu_count() or 1)
+        self._pool = WorkerPool(self.thread_pool.maxThreadCount())
+        self._scheduler = BatchScheduler(self.thread_pool.maxThreadCount(), count_pages=False)
+        self._signals = ConversionSignals()
+        self._signals.finished.connect(self.on_task_finished)
+        self._signals.written.connect(self.on_output_written)
+        self._cancel_event = threading.Event()
+        self._total = 0
+        self._done = 0
+        self._cancelled = 0
+        self._cache_hits = 0
+        self._batch_start = time.perf_counter()
+        self._writer = None
+        self._batch_options = self.options
+        # 结果、进度和状态栏每 100ms 合并刷新一次，不随每个文件重绘
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.setSingleShot(True)
+        self._refresh_timer.setInterval(100)
+        self._refresh_timer.timeout.connect(self._refresh)
+
+        layout.addSpacerItem(QSpacerItem(20, 20, QSizePolicy.Minimum, QSizePolicy.Expanding))
+        self.author_label = QLabel("By LeClaire", self)
+        self.author_label.setAlignment(Qt.AlignRight | Qt.AlignBottom)
+        layout.addWidget(self.author_label)
+
+    def dragEnterEvent(self, event):
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+
+    def dropEvent(self, event):
+        files = [u.toLocalFile() for u in event.mimeData().urls()]
+        self.process_files(files)
+
+    def open_file_dialog(self):
+        files, _ = QFileDialog.getOpenFileNames(self, "选择文件", "", "文档 (*.docx *.pdf *.zip)")
+        if files:
+            self.process_files(files)
+    
+    def open_file(self, index):
+        # 只有处理成功的记录才有输出文件，路径直接取自结果记录；打包输出的打开所在 ZIP
+        path = self.results.output_path(index.row())
+        if path is None:
+            return
+        path = split_zip_member(path)[0]
+        if os.path.exists(path):
+            if sys.platform.startswith('win'):
+                os.startfile(path)
+            elif sys.platform.startswith('darwin'):
+                subprocess.call(['open', path])
+            else:
+                subprocess.call(['xdg-open', path])
+        else:
+            self.status_label.setText(f"❌ 文件不存在：{path}")
+
+    def on_filter_changed(self, position):
+        self.results.flush()
+        self.results.set_status_filter(STATUS_FILTERS[position][1])
+
+    def process_files(self, files):
+        """把文件排入后台线程池，界面线程只负责接收结果并刷新列表"""
+        tasks = []
+        for path in files:
+            ext = os.path.splitext(path)[1].lower()
+            if ext == ".zip":
+                # 压缩包内的文书在子进程中直接从包内读取，不解压
+                try:
+                    tasks.extend(iter_zip_members(path))
+                except Exception as e:
+                    self.results.add(STATUS_FAILED, path, note=f"{type(e).__name__}: {e}")
+                continue
+            if ext not in SUPPORTED_EXTS:
+                self.results.add(STATUS_SKIPPED, path)
+                continue
+            tasks.append(path)
+        if not tasks:
+            self._schedule_refresh()
+            return
+
+        if self._done >= self._total or self._cancel_event.is_set():
+            if self._done >= self._total:
+                # 上一批已全部结束，重新开始计数
+                self._done = self._total = self._cache_hits = 0
+                self._batch_start = time.perf_counter()
+                self._scheduler = BatchScheduler(self.thread_pool.maxThreadCount(), count_pages=False)
+                self._start_output()
+            self._cancel_event = threading.Event()
+        # 重名的输出按输入路径事先编号，与完成的先后无关
+        self._writer.reserve(tasks)
+        self._total += len(tasks)
+        self.progress.setMaximum(self._total)
+        self.progress.setValue(self._done)
+        self.btn_cancel.setEnabled(True)
+        self._update_status()
+
+        # 估计耗时越长优先级越高：后拖入的大文件也会排到队列中较小的文件之前；
+        # 界面线程上只按文件大小估计（只 stat，不打开 PDF、不导入 PyMuPDF）
+        for path in self._scheduler.add(tasks):
+            task = ConversionTask(path, self.output_dir, self._batch_options, self._pool,
+                                  self._signals, self._cancel_event)
+            self.thread_pool.start(task, min(int(self._scheduler.cost(path) * 1000), 2 ** 31 - 1))
+
+    def _start_output(self):
+        """新一批开始：按勾选项决定 HTML 写入单独文件还是一个新的输出 ZIP，以及是否跳过重复文书。
+        HTML 都交给后台写入线程，界面线程和工作进程都不等磁盘。"""
+        self._batch_options = dict(self.options, html_in_result=True)
+        if self.zip_output.isChecked():
+            zip_path = os.path.join(self.output_dir, time.strftime("公众号格式-%Y%m%d-%H%M%S.zip"))
+            self._writer = HtmlZipWriter(zip_path, on_done=self._signals.written.emit)
+        else:
+            self._writer = HtmlFileWriter(self.output_dir, on_done=self._signals.written.emit)
+        if self.skip_duplicates.isChecked():
+            self._batch_options['dedup'] = "skip"
+
+    def _finish_output(self, abort=False):
+        writer, self._writer = self._writer, None
+        if writer is None:
+            return
+        if abort:
+            writer.abort()
+            return
+        writer.close()
+        if isinstance(writer, HtmlZipWriter):
+            self.results.add(STATUS_OK, writer.zip_path, writer.zip_path, time.perf_counter() - self._batch_start)
+
+    @staticmethod
+    def _duplicate_note(result):
+        if result.get('duplicate_of'):
+            return f"与 {os.path.basename(result['duplicate_of'])} 重复（相似度 {result['similarity']:.2f}）"
+        return None
+
+    def on_output_written(self, result):
+        """HTML 真正写出（或写入失败）后才列入结果"""
+        if result['ok']:
+            self.results.add(STATUS_OK, result['path'], result['html_path'], result['elapsed'],
+                             self._duplicate_note(result))
+        else:
+            self.results.add(STATUS_FAILED, result['path'], None, result['elapsed'], result['error'])
+        self._schedule_refresh()
+
+    def on_task_finished(self, result):
+        self._done += 1
+        self._scheduler.finished(result)
+        path = result['path']
+        if result.get('metrics'):
+            log_metrics(result['metrics'])
+        if result.get('cancelled'):
+            self._cancelled += 1
+            self.results.add(STATUS_CANCELLED, path)
+        elif result['ok']:
+            if result['cached']:
+                self._cache_hits += 1
+            if result.get('skipped'):
+                self.results.add(STATUS_SKIPPED, path, None, result['elapsed'], self._duplicate_note(result))
+            elif 'html' in result:
+                # 写出后由 on_output_written 列入结果
+                self._writer.add(result)
+            else:
+                self.on_output_written(result)
+        else:
+            self.results.add(STATUS_FAILED, path, None, result['elapsed'], result['error'])
+            logger.error("处理失败：%s\n%s", path, result.get('traceback', ''))
+        if self._done >= self._total:
+            self._finish_output()
+            # 最后一个结果立即刷新，不等定时器
+            self._refresh()
+        else:
+            self._schedule_refresh()
+
+    def _schedule_refresh(self):
+        if not self._refresh_timer.isActive():
+            self._refresh_timer.start()
+
+    def _refresh(self):
+        self._refresh_timer.stop()
+        self.results.flush()
+        self.progress.setValue(self._done)
+        self._update_status()
+        if self._done >= self._total:
+            self.btn_cancel.setEnabled(False)
+
+    def cancel_processing(self):
+        # 已在子进程中运行的文件会正常完成，排队中的任务开始时看到取消标记直接返回，
+        # 这样每个任务都会回报一次结果，进度计数保持准确
+        self._cancel_event.set()
+        self.btn_cancel.setEnabled(False)
+        self._update_status()
+
+    def _update_status(self):
+        elapsed = time.perf_counter() - self._batch_start
+        rate = self._done / elapsed if elapsed > 0 else 0.0
+        if self._cancel_event.is_set():
+            state = "已取消，等待进行中的文件完成" if self._done < self._total else f"已取消 {self._cancelled} 个未开始的文件"
+        elif self._done < self._total:
+            state = f"预计还需 {format_duration(self._scheduler.eta())}"
+        else:
+            state = ""
+        self.status_label.setText(
+            f"{self._done}/{self._total}  {rate:.1f} 文件/秒  缓存命中 {self._cache_hits}  {state}".rstrip())
+
+    def closeEvent(self, event):
+        self._cancel_event.set()
+        self.thread_pool.clear()
+        self.thread_pool.waitForDone()
+        self._pool.shutdown()
+        # 处理中途关闭窗口：不把未写完的输出 ZIP 改名为正式文件
+        self._finish_output(abort=self._done < self._total)
+        super().closeEvent(event)
+
+
+def gui_main(argv):
+    # --debug-dumps 由本程序处理，其余参数交给 Qt
+    debug_dumps = "--debug-dumps" in argv
+    qt_argv = [arg for arg in argv if arg != "--debug-dumps"]
+    setup_logging()
+    print(">>> QApplication initializing...")
+    app = QApplication(qt_argv)
+    win = DropWidget(debug_dumps=debug_dumps)
+    win.show()
+    print(">>> Main window created and shown!")
+    exit_code = app.exec_()
+    print(">>> QApplication exited with code", exit_code)
+    return exit_code
@@ -0,0 +1,389 @@
+"""本地 HTTP 转换服务：python main02noimage.py serve"""
+
+import os
+import time
+import json
+import argparse
+import asyncio
+import signal
+import itertools
+import multiprocessing
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from judgment_core import (
+    SUPPORTED_EXTS, DEFAULT_DOC_TIME_BUDGET, DEFAULT_DOC_MEMORY_BUDGET, DocTrace, WorkerMonitor, logger,
+    setup_logging, log_metrics, profiling, parse_document, generate_wechat_html, pdf_shard_budget, _init_worker,
+    _worker_budget,
+)
+
+SERVE_FORMATS = ("html", "json")
+HTTP_REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    411: "Length Required", 413: "Payload Too Large", 415: "Unsupported Media Type",
+    422: "Unprocessable Entity", 503: "Service Unavailable",
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+def _init_serve_worker(reports=None, shard_workers=None):
+    """服务模式的子进程常驻：启动时导入 PyMuPDF 和 python-docx，之后的请求不再承担导入开销"""
+    _init_worker(reports, shard_workers)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    import fitz  # noqa: F401  PyMuPDF
+    import docx  # noqa: F401
+
+
+def _serve_worker(name, content, fmt, key=None, time_budget=DEFAULT_DOC_TIME_BUDGET,
+                  memory_budget=DEFAULT_DOC_MEMORY_BUDGET):
+    """进程池中执行：把上传的文件内容转换为 HTML 或字段 JSON，异常只以字符串形式传回。
+    超出 time_budget（秒）/memory_budget（MB）时记为失败；key 为向主进程 WorkerMonitor 报告时用的请求标识。"""
+    start = time.perf_counter()
+    trace = DocTrace(name)
+    trace.record['input_bytes'] = len(content)
+    result = {'name': name, 'ok': False, 'error': None}
+    try:
+        ext = os.path.splitext(name)[1].lower()
+        if ext not in SUPPORTED_EXTS:
+            raise ValueError(f"非支持文件格式：{name}")
+        with profiling(trace), _worker_budget().watch(key or name, trace, time_budget, memory_budget):
+            data = parse_document(content, ext, trace)
+            if fmt == "html":
+                with trace.stage("render"):
+                    result['html'] = generate_wechat_html(data)
+            else:
+                result['fields'] = data
+        result['ok'] = True
+        trace.finish('ok')
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+        trace.finish('failed', result['error'])
+    result['elapsed'] = time.perf_counter() - start
+    result['metrics'] = trace.record
+    return result
+
+
+class ConversionService:
+    """asyncio 实现的本地 HTTP 转换服务。
+
+    POST /convert?format=html|json&name=xxx.pdf   请求体为单个文件内容
+    POST /convert?format=json   multipart/form-data 上传多个文件，按顺序返回每个文件的结果
+    GET  /metrics                                   队列深度、进行中任务数、延迟统计
+
+    进程池中最多同时运行 jobs 个文件；排队的文件超过 max_queue 时直接返回 503（背压），
+    不在内存中无限堆积上传内容。单个文件超出 time_budget/memory_budget 时返回失败；卡在 C 代码里
+    无法中断的，由 WorkerMonitor 终止所在的工作进程。工作进程被终止或异常退出使进程池损坏时换一个新的进程池，
+    当时正在转换的文件由 WorkerMonitor 判断：受牵连的在新进程池中重试，超时被终止或多次崩溃的判为失败，
+    排队中的文件不受影响。"""
+
+    def __init__(self, host="127.0.0.1", port=8765, jobs=None, max_queue=64,
+                 max_upload_bytes=64 * 1024 * 1024, time_budget=DEFAULT_DOC_TIME_BUDGET,
+                 memory_budget=DEFAULT_DOC_MEMORY_BUDGET):
+        self.host = host
+        self.port = port
+        self.jobs = jobs or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.max_upload_bytes = max_upload_bytes
+        self.time_budget = time_budget
+        self.memory_budget = memory_budget
+        self.waiting = 0        # 已接收、尚未进入进程池的文件数
+        self.in_flight = 0      # 进程池中正在转换的文件数
+        self.counters = defaultdict(int)
+        self.latencies = deque(maxlen=1000)   # 最近若干个文件的端到端耗时（秒）
+        self.started = time.time()
+        self.pool = None
+        self.monitor = None
+        self._slots = None
+        self._pool_lock = None
+        self._request_ids = itertools.count(1)
+
+    # ---- 转换调度 ----
+
+    @staticmethod
+    def _mp_context():
+        # 重建进程池时正有连接打开着，fork 出的子进程会继承这些套接字，服务端关闭连接后客户端收不到 EOF；
+        # 能用 forkserver 时由它启动子进程
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            return multiprocessing.get_context("forkserver")
+        return None
+
+    def _new_pool(self):
+        return ProcessPoolExecutor(max_workers=self.jobs, initializer=_init_serve_worker,
+                                   initargs=(self.monitor.reports, pdf_shard_budget(self.jobs)),
+                                   mp_context=self._mp_context())
+
+    async def _replace_pool(self, broken):
+        """broken 已损坏：换成新的进程池。同时在转换的几个文件都会遇到同一次损坏，只换一次"""
+        async with self._pool_lock:
+            if self.pool is not broken:
+                return
+            logger.warning("工作进程异常退出，重建进程池")
+            self.counters['pool_restarts'] += 1
+            self.pool = self._new_pool()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    async def _run_in_pool(self, name, content, fmt):
+        loop = asyncio.get_running_loop()
+        # 同名文件可能同时在转换，WorkerMonitor 按请求区分
+        key = f"{next(self._request_ids)}:{name}"
+        try:
+            while True:
+                pool = self.pool
+                try:
+                    result = await loop.run_in_executor(pool, _serve_worker, name, content, fmt, key,
+                                                        self.time_budget, self.memory_budget)
+                except BrokenProcessPool:
+                    await self._replace_pool(pool)
+                    # verdicts 要等工作进程的报告处理完，不在事件循环里等
+                    error = (await loop.run_in_executor(None, self.monitor.verdicts, {key}))[key]
+                    if error is not None:
+                        return {'name': name, 'ok': False, 'error': error, 'metrics': None}
+                    logger.warning("%s 转换时进程池损坏，重试", name)
+                    continue
+                self.monitor.finished(key)
+                return result
+        finally:
+            self.monitor.forget(key)
+
+    async def _convert_one(self, name, content, fmt):
+        start = time.perf_counter()
+        try:
+            async with self._slots:
+                self.waiting -= 1
+                self.in_flight += 1
+                try:
+                    result = await self._run_in_pool(name, content, fmt)
+                finally:
+                    self.in_flight -= 1
+        except Exception as e:
+            result = {'name': name, 'ok': False, 'error': f"{type(e).__name__}: {e}", 'metrics': None}
+        self.latencies.append(time.perf_counter() - start)
+        self.counters['completed' if result['ok'] else 'failed'] += 1
+        if result.get('metrics'):
+            log_metrics(result['metrics'])
+        return result
+
+    async def convert(self, uploads, fmt):
+        """uploads 为 [(文件名, 内容)]；排队数超过上限时整批拒绝"""
+        if self.waiting + len(uploads) > self.max_queue:
+            self.counters['rejected'] += len(uploads)
+            raise HTTPError(503, f"排队文件过多（{self.waiting}/{self.max_queue}），请稍后重试",
+                            {"Retry-After": "1"})
+        self.waiting += len(uploads)
+        return await asyncio.gather(*(self._convert_one(name, content, fmt) for name, content in uploads))
+
+    def metrics(self):
+        ordered = sorted(self.latencies)
+
+        def pct(p):
+            return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000, 3) if ordered else None
+
+        return {
+            'queue_depth': self.waiting,
+            'in_flight': self.in_flight,
+            'workers': self.jobs,
+            'max_queue': self.max_queue,
+            'completed': self.counters['completed'],
+            'failed': self.counters['failed'],
+            'rejected': self.counters['rejected'],
+            'pool_restarts': self.counters['pool_restarts'],
+            'requests': self.counters['requests'],
+            'latency_ms': {'samples': len(ordered), 'p50': pct(0.5), 'p95': pct(0.95),
+                           'max': round(ordered[-1] * 1000, 3) if ordered else None},
+            'uptime_s': round(time.time() - self.started, 1),
+        }
+
+    # ---- HTTP ----
+
+    async def _read_request(self, reader):
+        """读取一个 HTTP/1.1 请求，连接已关闭时返回 None"""
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            return None
+        except asyncio.LimitOverrunError:
+            raise HTTPError(400, "请求头过长")
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "请求行格式错误")
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                key, value = line.split(":", 1)
+                headers[key.strip().lower()] = value.strip()
+        body = b""
+        if method == "POST":
+            if "chunked" in headers.get("transfer-encoding", "").lower():
+                raise HTTPError(411, "不支持分块传输，请提供 Content-Length")
+            try:
+                length = int(headers.get("content-length", ""))
+            except ValueError:
+                raise HTTPError(411, "缺少 Content-Length")
+            if length > self.max_upload_bytes:
+                raise HTTPError(413, f"上传内容超过 {self.max_upload_bytes // (1024 * 1024)} MB")
+            body = await reader.readexactly(length)
+        return method, target, version, headers, body
+
+    @staticmethod
+    def _parse_uploads(headers, body, query):
+        """从请求中取出上传文件：multipart/form-data 可含多个文件，否则请求体即为单个文件"""
+        content_type = headers.get("content-type", "")
+        if content_type.startswith("multipart/form-data"):
+            from email.parser import BytesParser
+            from email.policy import HTTP
+            message = BytesParser(policy=HTTP).parsebytes(
+                b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n" + body)
+            uploads = [(part.get_filename(), part.get_payload(decode=True))
+                       for part in message.iter_parts() if part.get_filename()]
+            if not uploads:
+                raise HTTPError(400, "multipart 请求中没有文件")
+            return uploads, True
+        name = query.get("name", [None])[0] or headers.get("x-filename")
+        if not name:
+            raise HTTPError(400, "请用 ?name=文件名 或 X-Filename 头给出文件名（据此判断 DOCX/PDF）")
+        return [(name, body)], False
+
+    async def _dispatch(self, method, target, headers, body):
+        from urllib.parse import urlsplit, parse_qs
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        if url.path == "/metrics":
+            if method != "GET":
+                raise HTTPError(405, "只支持 GET")
+            return 200, "application/json", self.metrics(), {}
+        if url.path != "/convert":
+            raise HTTPError(404, "未知路径，可用：POST /convert，GET /metrics")
+        if method != "POST":
+            raise HTTPError(405, "只支持 POST")
+        fmt = query.get("format", ["html"])[0]
+        if fmt not in SERVE_FORMATS:
+            raise HTTPError(400, f"format 只能是 {'/'.join(SERVE_FORMATS)}")
+        uploads, multi = self._parse_uploads(headers, body, query)
+        for name, _ in uploads:
+            if os.path.splitext(name)[1].lower() not in SUPPORTED_EXTS:
+                raise HTTPError(415, f"非支持文件格式：{name}")
+        results = await self.convert(uploads, fmt)
+        if not multi:
+            result = results[0]
+            if not result['ok']:
+                return 422, "application/json", {'error': result['error']}, {}
+            if fmt == "html":
+                return 200, "text/html; charset=utf-8", result['html'], {}
+            return 200, "application/json", result['fields'], {}
+        result_key = "html" if fmt == "html" else "fields"
+        payload = [{key: r.get(key) for key in ('name', 'ok', 'error', result_key)} for r in results]
+        return 200, "application/json", {'results': payload}, {}
+
+    @staticmethod
+    async def _respond(writer, status, content_type, payload, headers, keep_alive):
+        if not isinstance(payload, str):
+            payload = json.dumps(payload, ensure_ascii=False)
+        if content_type == "application/json":
+            content_type += "; charset=utf-8"
+        body = payload.encode("utf-8")
+        lines = [f"HTTP/1.1 {status} {HTTP_REASONS[status]}",
+                 f"Content-Type: {content_type}",
+                 f"Content-Length: {len(body)}",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        lines += [f"{key}: {value}" for key, value in headers.items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                keep_alive = False
+                try:
+                    request = await self._read_request(reader)
+                    if request is None:
+                        break
+                    method, target, version, headers, body = request
+                    self.counters['requests'] += 1
+                    connection = headers.get("connection", "").lower()
+                    keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+                    status, content_type, payload, extra = await self._dispatch(method, target, headers, body)
+                except HTTPError as e:
+                    status, content_type, payload, extra = e.status, "application/json", {'error': str(e)}, e.headers
+                await self._respond(writer, status, content_type, payload, extra, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, stop_event=None):
+        self._slots = asyncio.Semaphore(self.jobs)
+        self._pool_lock = asyncio.Lock()
+        self.monitor = WorkerMonitor(self.time_budget, self._mp_context())
+        self.pool = self._new_pool()
+        try:
+            # 先让每个子进程都启动起来，首个请求不必等进程创建
+            await asyncio.gather(*(asyncio.get_running_loop().run_in_executor(self.pool, os.getpid)
+                                   for _ in range(self.jobs)))
+            server = await asyncio.start_server(self._handle, self.host, self.port, limit=64 * 1024)
+            print(f"转换服务已启动：http://{self.host}:{self.port}（{self.jobs} 个工作进程），Ctrl+C 退出",
+                  flush=True)
+            async with server:
+                if stop_event is None:
+                    await server.serve_forever()
+                else:
+                    await stop_event.wait()
+        finally:
+            self.pool.shutdown()
+            self.monitor.close()
+
+
+def serve_main(argv):
+    parser = argparse.ArgumentParser(
+        prog="main02noimage.py serve",
+        description="在本机启动 HTTP 转换服务：上传 DOCX/PDF，返回公众号格式 HTML 或解析字段 JSON",
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址（默认：%(default)s，仅本机可访问）")
+    parser.add_argument("--port", type=int, default=8765, help="监听端口（默认：%(default)s）")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="工作进程数（默认：CPU 核数）")
+    parser.add_argument("--max-queue", type=int, default=64,
+                        help="最多排队的文件数，超出时返回 503（默认：%(default)s）")
+    parser.add_argument("--max-upload", type=int, default=64,
+                        help="单个请求体大小上限（MB，默认：%(default)s）")
+    parser.add_argument("--time-budget", type=float, default=DEFAULT_DOC_TIME_BUDGET, metavar="SECONDS",
+                        help="单个文件处理时间上限，超出返回失败并注明所在阶段，0 表示不限（默认：%(default)s）")
+    parser.add_argument("--memory-budget", type=int, default=DEFAULT_DOC_MEMORY_BUDGET, metavar="MB",
+                        help="处理单个文件期间工作进程内存增长上限，0 表示不限（默认：%(default)s）")
+    parser.add_argument("--metrics-log", metavar="PATH",
+                        help="把每个文件的监测记录按行写成 JSON；\"-\" 表示 stderr")
+    args = parser.parse_args(argv)
+    if args.jobs < 1:
+        parser.error("--jobs 必须 >= 1")
+    setup_logging(args.metrics_log)
+
+    service = ConversionService(args.host, args.port, jobs=args.jobs, max_queue=args.max_queue,
+                                max_upload_bytes=args.max_upload * 1024 * 1024, time_budget=args.time_budget,
+                                memory_budget=args.memory_budget)
+
+    async def main():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, AttributeError):  # Windows
+                pass
+        await service.serve(stop)
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+    print("转换服务已停止")
+    return 0
@@ -0,0 +1,414 @@
+"""监视文件夹的守护模式：python main02noimage.py watch <目录>"""
+
+import sys
+import os
+import time
+import argparse
+import threading
+import sqlite3
+import signal
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+from judgment_core import (
+    SUPPORTED_EXTS, DEFAULT_PDF_PARALLEL_PAGES, DEFAULT_DOC_TIME_BUDGET, DEFAULT_DOC_MEMORY_BUDGET,
+    WorkerMonitor, base_path, logger, setup_logging, log_metrics, html_output_names, pdf_shard_budget, _init_worker,
+    _batch_worker, _print_result,
+)
+
+WATCH_INDEX_FILENAME = "watch_index.sqlite3"
+
+
+class WatchIndex:
+    """已处理文件索引（输出目录下的 SQLite），记录每个输入文件处理时的大小和修改时间。
+    重启时只需 stat 一遍目录并与索引比对，不必重新解析已处理过的文件。"""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS processed ("
+            " path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,"
+            " ok INTEGER NOT NULL, html_path TEXT, processed_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+        self.entries = {
+            path: (size, mtime_ns)
+            for path, size, mtime_ns in self.conn.execute("SELECT path, size, mtime_ns FROM processed")
+        }
+
+    def is_current(self, path, st):
+        return self.entries.get(path) == (st.st_size, st.st_mtime_ns)
+
+    def mark(self, path, st, ok, html_path=None):
+        self.entries[path] = (st.st_size, st.st_mtime_ns)
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO processed (path, size, mtime_ns, ok, html_path, processed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (path, st.st_size, st.st_mtime_ns, int(ok), html_path, time.time()),
+            )
+
+    def close(self):
+        self.conn.close()
+
+
+def _init_watch_worker(reports=None, shard_workers=None):
+    """监视模式的子进程忽略 Ctrl+C，由主进程等进行中的文件处理完再退出"""
+    _init_worker(reports, shard_workers)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _is_watch_candidate(name):
+    return not name.startswith(("~$", ".")) and os.path.splitext(name)[1].lower() in SUPPORTED_EXTS
+
+
+def iter_watch_files(root):
+    """递归列出目录下的 DOCX/PDF，返回 (路径, stat)；只做 stat，不读文件内容"""
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file() and _is_watch_candidate(entry.name):
+                            yield entry.path, entry.stat()
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+
+
+class _Inotify:
+    """Linux inotify 的最小封装（ctypes 调用 libc），递归监视目录"""
+
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_Q_OVERFLOW = 0x00004000
+    IN_ISDIR = 0x40000000
+    MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_MODIFY
+
+    def __init__(self, root):
+        import ctypes
+        import ctypes.util
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._ctypes = ctypes
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        self.dirs = {}
+        self.add_tree(root)
+
+    def add_tree(self, root):
+        for current, dirs, _ in os.walk(root):
+            wd = self._libc.inotify_add_watch(self.fd, os.fsencode(current), self.MASK)
+            if wd >= 0:
+                self.dirs[wd] = current
+
+    def read(self, timeout):
+        """等待 timeout 秒，返回 (变动的文件路径列表, 是否需要全量重扫)"""
+        import select
+        import struct
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return [], False
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return [], False
+        paths, rescan = [], False
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = struct.unpack_from("iIII", data, offset)
+            offset += 16
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & self.IN_Q_OVERFLOW:
+                rescan = True
+                continue
+            parent = self.dirs.get(wd)
+            if parent is None or not name:
+                continue
+            path = os.path.join(parent, name)
+            if mask & self.IN_ISDIR:
+                # 新建或移入的子目录：加监视，并把其中已有的文件当作变动处理
+                self.add_tree(path)
+                paths.extend(p for p, _ in iter_watch_files(path))
+            elif _is_watch_candidate(name):
+                paths.append(path)
+        return paths, rescan
+
+    def close(self):
+        os.close(self.fd)
+
+
+class FolderWatcher:
+    """监视 root 目录，把新增或改动的 DOCX/PDF 排入有界进程池转换。
+
+    - Linux 下用 inotify，其他平台或 inotify 不可用时定期 stat 轮询；
+    - 文件大小和修改时间连续 debounce 秒不变才处理，避免读到写了一半的文件；
+    - 输出目录下按输入文件所在的子目录建同样的子目录，不同子目录下的同名文件不会互相覆盖，
+      同一目录下的 a.docx 和 a.pdf 按 html_output_names 编号；
+    - 输出 HTML 比输入新，或索引中记录的大小/修改时间未变的文件直接跳过；
+    - 单个文件超出时间/内存预算（options 中的 time_budget/memory_budget）记为失败，卡在 C 代码里
+      无法中断的由 WorkerMonitor 终止所在的工作进程；
+    - 工作进程被终止或异常退出使进程池损坏时换一个新的进程池，当时正在处理的文件由 WorkerMonitor 判断：
+      超时被终止的记为失败，其余重新排队，有崩溃嫌疑的逐个单独重试，单独处理时仍然崩溃的才记为失败。"""
+
+    def __init__(self, root, output_dir, jobs=None, debounce=2.0, poll_interval=5.0,
+                 use_inotify=True, on_result=None, **options):
+        self.root = os.path.abspath(root)
+        self.output_dir = output_dir
+        self.jobs = jobs or os.cpu_count() or 1
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify and sys.platform.startswith("linux")
+        self.on_result = on_result
+        self.options = options
+        self.pending = {}      # 路径 -> (size, mtime_ns, 最近一次变化的时间)
+        self.ready = deque()   # 已稳定、等待进入进程池的路径
+        self.running = {}      # future -> (路径, stat, 所在进程池)
+        self.queued = set()    # ready 与 running 中的路径
+        self.monitor = None
+        self.pool = None
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def _touch(self, path, now):
+        try:
+            st = os.stat(path)
+        except OSError:
+            self.pending.pop(path, None)
+            return
+        key = (st.st_size, st.st_mtime_ns)
+        old = self.pending.get(path)
+        if old is None or old[:2] != key:
+            self.pending[path] = key + (now,)
+
+    def _html_dir(self, path):
+        return os.path.normpath(os.path.join(self.output_dir, os.path.relpath(os.path.dirname(path), self.root)))
+
+    def _html_path(self, path):
+        """path 的输出 HTML 路径：同一目录下输出同名的输入（如 a.docx 和 a.pdf）按 html_output_names 编号，
+        与批量转换的命名规则相同。只 stat 同名的几个候选，不列目录"""
+        directory, name = os.path.split(path)
+        stem = os.path.splitext(name)[0]
+        candidates = [path] + [os.path.join(directory, stem + e) for ext in SUPPORTED_EXTS for e in (ext, ext.upper())]
+        siblings = {}
+        for candidate in candidates:
+            try:
+                st = os.stat(candidate)
+            except OSError:
+                continue
+            # 不区分大小写的文件系统上 a.pdf 和 a.PDF 是同一个文件
+            siblings.setdefault((st.st_dev, st.st_ino), candidate)
+        names = html_output_names([path, *siblings.values()])
+        return os.path.join(self._html_dir(path), names[path])
+
+    def _needs_processing(self, path, st):
+        if self.index.is_current(path, st):
+            return False
+        if path in self.queued:
+            return False
+        html_path = self._html_path(path)
+        try:
+            if os.stat(html_path).st_mtime_ns >= st.st_mtime_ns:
+                # 以前（例如通过界面）已经转换过，补记到索引
+                self.index.mark(path, st, True, html_path)
+                return False
+        except OSError:
+            pass
+        return True
+
+    def _scan(self, now):
+        for path, st in iter_watch_files(self.root):
+            if not self.index.is_current(path, st):
+                self._touch(path, now)
+
+    def _promote_stable(self, now):
+        for path, (size, mtime_ns, changed_at) in list(self.pending.items()):
+            if now - changed_at < self.debounce:
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                del self.pending[path]
+                continue
+            if (st.st_size, st.st_mtime_ns) != (size, mtime_ns):
+                self.pending[path] = (st.st_size, st.st_mtime_ns, now)
+                continue
+            del self.pending[path]
+            if self._needs_processing(path, st):
+                self.ready.append(path)
+                self.queued.add(path)
+
+    def _new_pool(self):
+        return ProcessPoolExecutor(max_workers=self.jobs, initializer=_init_watch_worker,
+                                   initargs=(self.monitor.reports, pdf_shard_budget(self.jobs)))
+
+    def _replace_pool(self, broken):
+        """broken 已损坏：换成新的进程池。同一次损坏会在多个任务上报告，只换一次"""
+        if self.pool is not broken:
+            return
+        logger.warning("工作进程异常退出，重建进程池")
+        self.pool = self._new_pool()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self):
+        # 进程池中最多保留 2×jobs 个任务，其余留在 ready 队列里
+        while self.ready and len(self.running) < self.jobs * 2:
+            # 有崩溃嫌疑的文件单独处理，再次损坏时就能确定是它
+            if self.running and (self.monitor.suspected(self.ready[0]) or self._suspect_running()):
+                return
+            path = self.ready.popleft()
+            try:
+                st = os.stat(path)
+            except OSError:
+                self.queued.discard(path)
+                continue
+            pool = self.pool
+            html_dir, html_name = os.path.split(self._html_path(path))
+            try:
+                future = pool.submit(_batch_worker, path, self.output_dir, html_dir=html_dir, html_name=html_name,
+                                     **self.options)
+            except BrokenProcessPool:
+                # 空闲的工作进程也可能被终止（例如内存不足），下一轮用新进程池提交
+                self.ready.appendleft(path)
+                self._replace_pool(pool)
+                return
+            self.running[future] = (path, st, pool)
+
+    def _suspect_running(self):
+        return any(self.monitor.suspected(path) for path, _, _ in self.running.values())
+
+    def _harvest(self, timeout=0):
+        if not self.running:
+            return
+        done, _ = wait(list(self.running), timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            path, st, pool = self.running.pop(future)
+            try:
+                result = future.result()
+                self.monitor.finished(path)
+            except BrokenProcessPool:
+                self._replace_pool(pool)
+                error = self.monitor.verdicts({path})[path]
+                if error is None:
+                    # 进程池损坏不是这个文件的处理结果，不记入索引，重新排队
+                    logger.warning("%s 处理时进程池损坏，重试", path)
+                    self.ready.appendleft(path)
+                    continue
+                result = {'path': path, 'ok': False, 'html_path': None, 'cached': False,
+                          'error': error, 'elapsed': 0.0}
+            except Exception as e:
+                result = {'path': path, 'ok': False, 'html_path': None, 'cached': False,
+                          'error': f"{type(e).__name__}: {e}", 'elapsed': 0.0}
+            self.monitor.forget(path)
+            self.queued.discard(path)
+            # 失败的文件同样记入索引，文件再次改动后才会重试
+            self.index.mark(path, st, result['ok'], result['html_path'])
+            if self.on_result:
+                self.on_result(result)
+
+    def run(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.index = WatchIndex(os.path.join(self.output_dir, WATCH_INDEX_FILENAME))
+        notifier = None
+        if self.use_inotify:
+            try:
+                notifier = _Inotify(self.root)
+            except (OSError, AttributeError) as e:
+                logger.warning("inotify 不可用，改为轮询：%s", e)
+        mode = "inotify" if notifier else f"轮询（每 {self.poll_interval:g}s）"
+        print(f"开始监视 {self.root}（{mode}），输出到 {self.output_dir}，Ctrl+C 退出", flush=True)
+
+        # 启动时只比对 stat 与索引；已存在的文件也可能正在复制，同样要等大小和修改时间稳定 debounce 秒
+        self._scan(time.monotonic())
+        next_poll = time.monotonic() + self.poll_interval
+        tick = min(0.5, self.debounce / 2) if self.debounce > 0 else 0.5
+        self.monitor = WorkerMonitor(self.options.get('time_budget', DEFAULT_DOC_TIME_BUDGET))
+        self.pool = self._new_pool()
+        try:
+            while not self._stop.is_set():
+                now = time.monotonic()
+                if notifier:
+                    paths, rescan = notifier.read(tick)
+                    now = time.monotonic()
+                    for path in paths:
+                        self._touch(path, now)
+                    if rescan:
+                        self._scan(now)
+                else:
+                    if now >= next_poll:
+                        self._scan(now)
+                        next_poll = now + self.poll_interval
+                    self._stop.wait(tick)
+                    now = time.monotonic()
+                self._promote_stable(now)
+                self._submit()
+                self._harvest()
+            # 退出前等进行中的文件处理完，保证索引与输出一致；因崩溃重新排队的留到下次启动
+            while self.running:
+                self._harvest(timeout=None)
+        finally:
+            self.pool.shutdown()
+            self.monitor.close()
+            if notifier:
+                notifier.close()
+            self.index.close()
+
+
+def watch_main(argv):
+    parser = argparse.ArgumentParser(
+        prog="main02noimage.py watch",
+        description="监视文件夹，自动把新放入或改动的裁判文书 DOCX/PDF 转换为公众号格式 HTML",
+    )
+    parser.add_argument("folder", help="要监视的目录（含子目录）")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="并行进程数（默认：CPU 核数）")
+    parser.add_argument("-o", "--output", default=os.path.join(base_path, "output"),
+                        help="输出目录（默认：程序目录下的 output）")
+    parser.add_argument("--debounce", type=float, default=2.0,
+                        help="文件大小和修改时间保持不变多少秒后才处理（默认：%(default)s）")
+    parser.add_argument("--poll-interval", type=float, default=5.0,
+                        help="轮询模式下的扫描间隔秒数（默认：%(default)s）")
+    parser.add_argument("--poll", action="store_true", help="不使用 inotify，强制轮询")
+    parser.add_argument("--no-cache", action="store_true", help="不使用转换结果缓存")
+    parser.add_argument("--pdf-parallel-pages", type=int, default=DEFAULT_PDF_PARALLEL_PAGES, metavar="N",
+                        help="页数不少于 N 的 PDF 按页分片多进程提取文本，0 表示关闭（默认：%(default)s）")
+    parser.add_argument("--time-budget", type=float, default=DEFAULT_DOC_TIME_BUDGET, metavar="SECONDS",
+                        help="单个文件处理时间上限，超出记为失败并注明所在阶段，0 表示不限（默认：%(default)s）")
+    parser.add_argument("--memory-budget", type=int, default=DEFAULT_DOC_MEMORY_BUDGET, metavar="MB",
+                        help="处理单个文件期间工作进程内存增长上限，0 表示不限（默认：%(default)s）")
+    parser.add_argument("--metrics-log", metavar="PATH",
+                        help="把每个文件的监测记录按行写成 JSON；\"-\" 表示 stderr")
+    args = parser.parse_args(argv)
+    if args.jobs < 1:
+        parser.error("--jobs 必须 >= 1")
+    if not os.path.isdir(args.folder):
+        parser.error(f"目录不存在：{args.folder}")
+    setup_logging(args.metrics_log)
+
+    def on_result(result):
+        _print_result(result)
+        if result.get('metrics'):
+            log_metrics(result['metrics'])
+
+    watcher = FolderWatcher(args.folder, args.output, jobs=args.jobs, debounce=args.debounce,
+                            poll_interval=args.poll_interval, use_inotify=not args.poll,
+                            on_result=on_result, use_cache=not args.no_cache,
+                            pdf_parallel_pages=args.pdf_parallel_pages, time_budget=args.time_budget,
+                            memory_budget=args.memory_budget)
+    signal.signal(signal.SIGINT, lambda *_: watcher.stop())
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, lambda *_: watcher.stop())
+    watcher.run()
+    print("已停止监视")
+    return 0
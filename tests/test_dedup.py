@@ -0,0 +1,63 @@
+"""近似重复检测与结果缓存的配合：同一输出目录重复转换时，命中缓存的文件也要照常查重。
+
+合成语料中每篇文书各有一份 DOCX 和 PDF，内容相同、版式不同，另复制一份 DOCX 作为完全相同的副本；
+每组里第一个转换的是原件，其余都应标为它的重复。
+"""
+
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+
+@pytest.fixture(scope="module")
+def corpus_files(tmp_path_factory):
+    pytest.importorskip("docx")
+    pytest.importorskip("fitz")
+    from corpus import generate_corpus
+    corpus_dir = str(tmp_path_factory.mktemp("corpus"))
+    files = generate_corpus(corpus_dir, docs=3, pages=2, seed=0)
+    copy = os.path.join(corpus_dir, "copy-of-first.docx")
+    shutil.copyfile(files[0], copy)
+    return files + [copy]
+
+
+def convert_all(files, output_dir, dedup):
+    import judgment_core as core
+    return {os.path.basename(path): core.convert_file(path, output_dir, dedup=dedup) for path in files}
+
+
+def duplicates(results):
+    return {name: os.path.basename(result['duplicate_of'])
+            for name, result in results.items() if 'duplicate_of' in result}
+
+
+def test_dedup_twice_over_cached_corpus(corpus_files, tmp_path):
+    output_dir = str(tmp_path)
+    first = convert_all(corpus_files, output_dir, "flag")
+    # 副本与第一篇内容相同，第一遍就已命中缓存
+    assert [name for name, result in first.items() if result['cached']] == ["copy-of-first.docx"]
+    expected = duplicates(first)
+    # 三组各有一个原件，其余 4 个文件（3 个 PDF、1 个副本）都是重复
+    assert len(expected) == len(corpus_files) - 3
+    assert expected["copy-of-first.docx"] == os.path.basename(corpus_files[0])
+
+    second = convert_all(corpus_files, output_dir, "flag")
+    assert all(result['cached'] for result in second.values())
+    assert duplicates(second) == expected
+
+
+def test_dedup_on_cache_warmed_without_dedup(corpus_files, tmp_path):
+    output_dir = str(tmp_path)
+    convert_all(corpus_files, output_dir, None)
+    flagged = convert_all(corpus_files, output_dir, "flag")
+    assert all(result['cached'] for result in flagged.values())
+    assert len(duplicates(flagged)) == len(corpus_files) - 3
+
+    skipped = convert_all(corpus_files, output_dir, "skip")
+    assert sorted(name for name, result in skipped.items() if result.get('skipped')) == sorted(duplicates(flagged))
@@ -0,0 +1,92 @@
+"""解析字段导出（FieldExporter）与全文检索（search_judgments）。"""
+
+import json
+import os
+import sqlite3
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import judgment_core as core  # noqa: E402
+
+
+def fields(case_number, judge_info, trial_analysis="本院认为，上诉人的上诉请求不能成立。"):
+    return {
+        'case_name': "张某与李某买卖合同纠纷二审民事判决书",
+        'case_number': case_number,
+        'parties_info': "上诉人（原审被告）：张某，男。\n被上诉人（原审原告）：李某，女。",
+        'litigation_process': "上诉人张某因与被上诉人李某买卖合同纠纷一案，不服一审判决，向本院提起上诉。",
+        'case_info': "本院查明：双方签订买卖合同，约定货款十万元。",
+        'trial_analysis': trial_analysis,
+        'trial_result': "驳回上诉，维持原判。",
+        'judge_info': judge_info,
+    }
+
+
+@pytest.fixture
+def exported(tmp_path):
+    conn = sqlite3.connect(":memory:")
+    try:
+        conn.execute("CREATE VIRTUAL TABLE t USING fts5(x)")
+    except sqlite3.OperationalError:
+        pytest.skip("SQLite 未编译 FTS5")
+    finally:
+        conn.close()
+    paths = {name: str(tmp_path / "in" / name) for name in ("a.docx", "b.pdf")}
+    db_path = str(tmp_path / "out" / "fields.sqlite3")
+    jsonl_path = str(tmp_path / "out" / "fields.jsonl")
+    exporter = core.FieldExporter(jsonl_path, db_path, batch_size=1)
+    exporter.add(paths["a.docx"], fields("（2023）京01民终1号", "审判长王五\n审判员赵六"))
+    exporter.add(paths["b.pdf"], fields("（2023）京01民终2号", "审判长孙七\n审判员周八"))
+    exporter.close()
+    return paths, db_path, jsonl_path
+
+
+def row_counts(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return tuple(conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+                     for table in ("judgments", "judgments_fts"))
+    finally:
+        conn.close()
+
+
+def test_search_by_field(exported):
+    paths, db_path, _ = exported
+    hits = core.search_judgments(db_path, "王五", field="judge_info")
+    assert [hit['source_path'] for hit in hits] == [paths["a.docx"]]
+    assert hits[0]['case_number'] == "（2023）京01民终1号"
+    assert "【王五】" in hits[0]['snippet']
+    # 只在指定字段中检索：当事人里的“张某”不出现在审判人员中
+    assert core.search_judgments(db_path, "张某", field="judge_info") == []
+    assert len(core.search_judgments(db_path, "张某")) == 2
+    # 多个关键词须同时出现
+    assert [hit['case_number'] for hit in core.search_judgments(db_path, "孙七 周八")] == ["（2023）京01民终2号"]
+    assert core.search_judgments(db_path, "孙七 王五") == []
+    with pytest.raises(ValueError):
+        core.search_judgments(db_path, "王五", field="no_such_field")
+
+
+def test_rerun_export_replaces_rows(exported):
+    paths, db_path, jsonl_path = exported
+    # 同一批文件再导出一次，其中一篇的字段有变化
+    exporter = core.FieldExporter(jsonl_path, db_path)
+    exporter.add(paths["a.docx"], fields("（2023）京01民终1号", "审判长钱九\n审判员赵六"))
+    exporter.add(paths["b.pdf"], fields("（2023）京01民终2号", "审判长孙七\n审判员周八"))
+    exporter.close()
+    assert exporter.count == 2
+
+    # SQLite 中每个源文件只保留最新一次导出，全文索引随之更新
+    assert row_counts(db_path) == (2, 2)
+    assert core.search_judgments(db_path, "王五") == []
+    assert [hit['source_path'] for hit in core.search_judgments(db_path, "钱九")] == [paths["a.docx"]]
+    assert len(core.search_judgments(db_path, "赵六")) == 1
+
+    # JSONL 按次追加
+    with open(jsonl_path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert [record['source_path'] for record in records] == [paths["a.docx"], paths["b.pdf"]] * 2
+    assert records[-2]['judge_info'].startswith("审判长钱九")
@@ -0,0 +1,99 @@
+"""字段解析的回归（黄金）测试：在固定种子的合成语料上，逐篇核对 DOCX/PDF 两条解析路径
+产出的每个字段与改写前的实现（分段器重写之前的 main02noimage.py）完全一致。
+
+golden/fields.json 存的是各字段值的 SHA-256 前缀，由改写前的实现生成：
+
+    git show <基线提交>:main02noimage.py > /tmp/reference_main.py
+    python tests/test_fields_golden.py --regenerate /tmp/reference_main.py
+
+解析逻辑有意改变输出时，用同样的命令、以新的参考实现重新生成并在提交中说明。
+"""
+
+import hashlib
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden", "fields.json")
+# (页数, 篇数)：短文书覆盖常见版式，20 页的覆盖跨页拼接和长段落
+CORPUS = ((2, 10), (20, 3))
+SEED = 0
+
+
+def generate(corpus_dir):
+    from corpus import generate_corpus
+    files = []
+    for pages, docs in CORPUS:
+        files += generate_corpus(os.path.join(corpus_dir, f"p{pages}"), docs, pages, SEED)
+    return files
+
+
+def fields_digest(fields):
+    return {name: hashlib.sha256(value.encode("utf-8")).hexdigest()[:16] for name, value in sorted(fields.items())}
+
+
+def current_fields(path):
+    import judgment_core as core
+    if path.endswith(".docx"):
+        judgment = core.load_docx(path)
+        return core.parse_fields(judgment.full_text, judgment.case_name, judgment.case_number)
+    return core.extract_text_from_txt(*core.extract_pdf_text(path))
+
+
+def reference_fields(module, path, scratch_dir):
+    if path.endswith(".docx"):
+        text = "\n".join(module.extract_text_from_docx(path))
+        return module.parse_fields(text, module.get_case_name_from_docx(path), module.get_case_number_from_docx(path))
+    return module.extract_text_from_pdf(path, scratch_dir, "reference")
+
+
+@pytest.fixture(scope="module")
+def corpus_files(tmp_path_factory):
+    pytest.importorskip("docx")
+    pytest.importorskip("fitz")
+    return generate(str(tmp_path_factory.mktemp("corpus")))
+
+
+def test_fields_match_golden(corpus_files):
+    with open(GOLDEN_PATH, encoding="utf-8") as f:
+        golden = json.load(f)
+    assert sorted(golden) == sorted(os.path.basename(path) for path in corpus_files)
+    mismatches = {}
+    for path in corpus_files:
+        name = os.path.basename(path)
+        actual = fields_digest(current_fields(path))
+        changed = [field for field in golden[name] if actual.get(field) != golden[name][field]]
+        if changed:
+            mismatches[name] = changed
+    assert not mismatches, f"以下文书的字段与改写前不一致：{mismatches}"
+
+
+def regenerate(reference_path):
+    """用参考实现（改写前的 main02noimage.py）重新生成 golden/fields.json"""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    spec = importlib.util.spec_from_file_location("reference_main", reference_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    golden = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for path in generate(os.path.join(tmp, "corpus")):
+            golden[os.path.basename(path)] = fields_digest(reference_fields(module, path, tmp))
+    os.makedirs(os.path.dirname(GOLDEN_PATH), exist_ok=True)
+    with open(GOLDEN_PATH, "w", encoding="utf-8") as f:
+        json.dump(golden, f, ensure_ascii=False, indent=1, sort_keys=True)
+        f.write("\n")
+    print(f"已写入 {len(golden)} 篇：{GOLDEN_PATH}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != "--regenerate":
+        sys.exit("用法：python tests/test_fields_golden.py --regenerate <参考实现 main02noimage.py>")
+    regenerate(sys.argv[2])
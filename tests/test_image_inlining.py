@@ -0,0 +1,89 @@
+"""图片内联的安全边界：只内联输入文件所在目录之内、不超过大小上限的本地图片，
+其余一律保留原来的 src，不能让文书正文把本机任意文件嵌进输出。"""
+
+import io
+import os
+import sys
+from collections import defaultdict
+from urllib.parse import quote
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import judgment_core as core  # noqa: E402
+
+MAX_IMAGE_BYTES = 1024
+SECRET = b"\x89PNG secret outside the document directory"
+
+
+@pytest.fixture
+def base_dir(tmp_path):
+    """tmp_path/doc 为输入文件所在目录，tmp_path/secret.png 在它之外"""
+    doc = tmp_path / "doc"
+    (doc / "sub").mkdir(parents=True)
+    (tmp_path / "secret.png").write_bytes(SECRET)
+    (doc / "ok.png").write_bytes(b"\x89PNG ok")
+    (doc / "big.png").write_bytes(b"\0" * (MAX_IMAGE_BYTES + 1))
+    return doc
+
+
+def inline(html, base_dir):
+    stats = defaultdict(int)
+    out = io.StringIO()
+    writer = core.ImageInliningWriter(out, str(base_dir), core.ImageInliner(MAX_IMAGE_BYTES), stats)
+    writer.write(html)
+    writer.close()
+    return out.getvalue(), stats
+
+
+def test_relative_image_inside_base_dir_is_inlined(base_dir):
+    html, stats = inline('<p><img src="ok.png"></p>', base_dir)
+    assert html.startswith('<p><img src="data:image/png;base64,')
+    assert stats['images_inlined'] == 1
+
+
+@pytest.mark.parametrize("src", [
+    "../secret.png",
+    "sub/../../secret.png",
+    "%2e%2e/secret.png",
+    "..%2Fsecret.png",
+])
+def test_parent_directory_escape_is_kept(base_dir, src):
+    tag = f'<img src="{src}">'
+    assert inline(tag, base_dir)[0] == tag
+
+
+def test_absolute_path_is_kept(base_dir):
+    secret = str(base_dir.parent / "secret.png")
+    for src in (secret, secret.replace(os.sep, "/"), "C:/Windows/secret.png", "\\\\server\\share\\secret.png"):
+        tag = f'<img src="{src}">'
+        assert inline(tag, base_dir)[0] == tag
+
+
+def test_file_url_is_kept(base_dir):
+    secret = (base_dir.parent / "secret.png").as_posix()
+    for src in ("file://" + quote(secret), "FILE://" + secret, "file:../secret.png", "file:ok.png"):
+        tag = f"<img src='{src}'>"
+        assert inline(tag, base_dir)[0] == tag
+
+
+def test_symlink_escaping_base_dir_is_kept(base_dir):
+    link = base_dir / "link.png"
+    try:
+        os.symlink(base_dir.parent / "secret.png", link)
+    except (OSError, NotImplementedError):
+        pytest.skip("无法创建符号链接")
+    tag = '<img src="link.png">'
+    html, stats = inline(tag, base_dir)
+    assert html == tag
+    assert stats['images_inlined'] == 0
+
+
+def test_image_over_size_limit_is_kept(base_dir):
+    tag = '<img alt="x" src="big.png" width="10">'
+    html, stats = inline(tag, base_dir)
+    assert html == tag
+    assert stats['images_linked'] == 1
+    assert stats['images_inlined'] == 0
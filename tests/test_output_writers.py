@@ -0,0 +1,90 @@
+"""输出写入：HtmlFileWriter/HtmlZipWriter 的重名编号与失败处理。"""
+
+import os
+import sys
+import threading
+import zipfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import judgment_core as core  # noqa: E402
+
+# 输出都叫 x-公众号格式.html 的几个输入，按路径（不分大小写）排序后依次编号
+SAME_NAME_INPUTS = ["/in/b/x.pdf", "/in/x.DOCX", "/in/a/x.docx", "/in/y.docx"]
+EXPECTED_NAMES = {
+    "/in/a/x.docx": "x-公众号格式.html",
+    "/in/b/x.pdf": "x-公众号格式(2).html",
+    "/in/x.DOCX": "x-公众号格式(3).html",
+    "/in/y.docx": "y-公众号格式.html",
+}
+
+
+def converted(path):
+    """模拟 convert_file(html_in_result=True) 的成功结果，HTML 内容即输入路径"""
+    return {'path': path, 'ok': True, 'cached': False, 'elapsed': 0.0,
+            'html_path': os.path.basename(core.html_output_path(path, "")), 'html': path}
+
+
+def test_html_output_names():
+    assert core.html_output_names(SAME_NAME_INPUTS) == EXPECTED_NAMES
+    taken = set()
+    first = core.html_output_names(["/in/a/x.docx"], taken)
+    # 分批登记时，后加入的不会抢走已分配的名字
+    assert core.html_output_names(["/in/0/x.pdf"], taken) == {"/in/0/x.pdf": "x-公众号格式(2).html"}
+    assert first == {"/in/a/x.docx": "x-公众号格式.html"}
+
+
+@pytest.mark.parametrize("order", [SAME_NAME_INPUTS, SAME_NAME_INPUTS[::-1]])
+def test_file_writer_names_do_not_depend_on_completion_order(tmp_path, order):
+    writer = core.HtmlFileWriter(str(tmp_path), fsync=False)
+    writer.reserve(SAME_NAME_INPUTS)
+    for path in order:
+        writer.add(converted(path))
+    writer.close()
+    written = {(tmp_path / name).read_text(encoding="utf-8"): name for name in os.listdir(tmp_path)}
+    assert written == EXPECTED_NAMES
+
+
+@pytest.mark.parametrize("order", [SAME_NAME_INPUTS, SAME_NAME_INPUTS[::-1]])
+def test_zip_writer_names_do_not_depend_on_completion_order(tmp_path, order):
+    zip_path = str(tmp_path / "out.zip")
+    writer = core.HtmlZipWriter(zip_path)
+    writer.reserve(SAME_NAME_INPUTS)
+    for path in order:
+        writer.add(converted(path))
+    writer.close()
+    with zipfile.ZipFile(zip_path) as zf:
+        written = {zf.read(name).decode("utf-8"): name for name in zf.namelist()}
+    assert written == EXPECTED_NAMES
+
+
+def test_file_writer_survives_failing_callback(tmp_path):
+    """on_done 出错、写入时出现 OSError 以外的异常，都只让该篇记为失败，写入线程不退出"""
+    reported = []
+
+    def on_done(result):
+        if result['path'] == "/in/a.docx" and result['ok']:
+            raise RuntimeError("回调出错")
+        reported.append((result['path'], result['ok'], result['error'] if not result['ok'] else None))
+
+    writer = core.HtmlFileWriter(str(tmp_path), on_done=on_done, fsync=False, fsync_batch=1)
+    writer.add(converted("/in/a.docx"))
+    broken = converted("/in/b.docx")
+    broken['html'] = None   # 写入时抛出 TypeError
+    writer.add(broken)
+    writer.add(converted("/in/c.docx"))
+    # 写入线程若已退出，close() 会一直阻塞
+    closer = threading.Thread(target=writer.close, daemon=True)
+    closer.start()
+    closer.join(10)
+    assert not closer.is_alive()
+
+    assert [(path, ok) for path, ok, _ in reported] == [("/in/a.docx", False), ("/in/b.docx", False),
+                                                        ("/in/c.docx", True)]
+    assert reported[0][2].startswith("输出回调出错：RuntimeError")
+    assert reported[1][2].startswith("写入输出失败：TypeError")
+    assert (tmp_path / "c-公众号格式.html").read_text(encoding="utf-8") == "/in/c.docx"
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".part")]
@@ -0,0 +1,71 @@
+"""批量调度（BatchScheduler）：按估计耗时从大到小排序，按实测耗时校准剩余时间。"""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import judgment_core as core  # noqa: E402
+
+DOCX_RATE = core.DEFAULT_WORK_RATES['docx_kb']
+PDF_RATE = core.DEFAULT_WORK_RATES['pdf_kb']
+
+
+@pytest.fixture
+def files(tmp_path):
+    """按大小估计工作量的输入：{名字: 路径}，missing.docx 不存在，按 1KB 估计"""
+    sizes = {"a.docx": 10, "b.docx": 300, "c.pdf": 100, "d.docx": 10}
+    paths = {}
+    for name, kb in sizes.items():
+        path = tmp_path / name
+        path.write_bytes(b"\0" * (kb * 1024))
+        paths[name] = str(path)
+    paths["missing.docx"] = str(tmp_path / "missing.docx")
+    return paths
+
+
+def result(path, elapsed, ok=True, cached=False):
+    return {'path': path, 'ok': ok, 'cached': cached, 'elapsed': elapsed, 'html_path': None}
+
+
+def test_longest_estimated_first(files):
+    scheduler = core.BatchScheduler(workers=2, count_pages=False)
+    order = scheduler.add([files[name] for name in ("a.docx", "b.docx", "c.pdf", "d.docx", "missing.docx")])
+    # PDF 每 KB 比 DOCX 慢得多：100KB 的 PDF 排在 300KB 的 DOCX 之前；估计相同的保持原顺序
+    assert [os.path.basename(path) for path in order] == ["c.pdf", "b.docx", "a.docx", "d.docx", "missing.docx"]
+    assert scheduler.cost(files["c.pdf"]) == pytest.approx(100 * PDF_RATE)
+    assert scheduler.cost(files["missing.docx"]) == pytest.approx(DOCX_RATE)
+
+
+def test_eta_is_calibrated_by_finished_files(files):
+    scheduler = core.BatchScheduler(workers=2, count_pages=False)
+    scheduler.add(list(files.values()))
+    assert scheduler.pending == 5
+    assert scheduler.eta() == pytest.approx((100 * PDF_RATE + 321 * DOCX_RATE) / 2)
+
+    # b.docx 实际用了 3 秒：DOCX 速度按默认速度（折算为 PRIOR_WORK_UNITS 个单位）与实测加权平均
+    scheduler.finished(result(files["b.docx"], 3.0))
+    prior = core.PRIOR_WORK_UNITS['docx_kb']
+    docx_rate = (DOCX_RATE * prior + 3.0) / (prior + 300)
+    assert scheduler.rate('docx_kb') == pytest.approx(docx_rate)
+    assert scheduler.cost(files["a.docx"]) == pytest.approx(10 * docx_rate)
+    assert scheduler.eta() == pytest.approx((100 * PDF_RATE + 21 * docx_rate) / 2)
+
+    # 命中缓存的结果只扣除剩余工作量，不参与校准
+    scheduler.finished(result(files["c.pdf"], 0.01, cached=True))
+    assert scheduler.rate('pdf_kb') == pytest.approx(PDF_RATE)
+    assert scheduler.eta() == pytest.approx(21 * docx_rate / 2)
+
+    # 剩一个文件时只有一个进程在干活
+    scheduler.finished(result(files["a.docx"], 0.0, ok=False))
+    scheduler.finished(result(files["d.docx"], 0.0, ok=False))
+    assert scheduler.eta() == pytest.approx(docx_rate)
+    scheduler.finished(result(files["missing.docx"], 0.0, ok=False))
+    assert scheduler.pending == 0
+    assert scheduler.eta() == 0.0
+    # 未登记的路径忽略
+    scheduler.finished(result("unknown.docx", 1.0))
+    assert scheduler.pending == 0
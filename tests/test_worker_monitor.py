@@ -0,0 +1,60 @@
+"""单个文书的预算（DocBudget）与 WorkerMonitor.verdicts：进程池损坏后哪些文书重试、哪些判为失败。"""
+
+import os
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import judgment_core as core  # noqa: E402
+
+
+@pytest.fixture
+def monitor():
+    monitor = core.WorkerMonitor(time_budget=0)
+    yield monitor
+    monitor.close()
+
+
+def test_pool_that_never_starts_work_gives_up(monitor):
+    """工作进程还没报告开始处理就退出（如初始化时崩溃）：连续损坏若干次后全部判为失败"""
+    paths = {"a.docx", "b.pdf"}
+    for _ in range(core.POOL_BROKEN_RETRIES - 1):
+        assert monitor.verdicts(paths) == {"a.docx": None, "b.pdf": None}
+    final = monitor.verdicts(paths)
+    assert all(error and "进程池反复损坏" in error for error in final.values())
+
+
+def test_progress_between_breakages_resets_the_count(monitor):
+    for _ in range(core.POOL_BROKEN_RETRIES * 2):
+        assert monitor.verdicts({"queued.docx"}) == {"queued.docx": None}
+        monitor.finished("other.docx")
+
+
+def test_in_flight_crash_is_blamed_and_queued_files_retry(monitor):
+    for attempt in range(1, core.POOL_BROKEN_RETRIES + 1):
+        monitor.reports.put(("start", 1000 + attempt, "crash.docx"))
+        verdicts = monitor.verdicts({"crash.docx", "queued.docx"})
+        # 损坏查明是 crash.docx 所致，排在后面的文书不计入连续损坏次数
+        assert verdicts["queued.docx"] is None
+        assert monitor.suspected("crash.docx")
+        if attempt >= core.WORKER_CRASH_RETRIES:
+            assert "工作进程异常退出" in verdicts["crash.docx"]
+            break
+        assert verdicts["crash.docx"] is None
+
+
+@pytest.mark.skipif(core._BUDGET_SIGNAL is None, reason="平台不支持软中断")
+def test_time_budget_shorter_than_poll_interval():
+    """预算短于默认检查间隔时也要生效：0.1s 的预算打断 0.17s 的处理"""
+    budget = core.DocBudget()
+    trace = core.DocTrace("short.docx")
+    with pytest.raises(core.BudgetExceeded):
+        with budget.watch("short.docx", trace, time_budget=0.1, memory_budget=0):
+            # 信号只在执行 Python 字节码时处理，不能用 time.sleep
+            deadline = time.monotonic() + 0.17
+            while time.monotonic() < deadline:
+                pass
@@ -0,0 +1,82 @@
+"""ZIP 压缩包输入（“a.zip!/b.docx”，不解压）与 batch --output-zip 输出。"""
+
+import os
+import sys
+import zipfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import judgment_core as core  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def bundle(tmp_path_factory):
+    """input/bundle.zip 中放两篇文书的 DOCX/PDF（包内子目录 sub/ 下），外加应被跳过的附带文件"""
+    pytest.importorskip("docx")
+    pytest.importorskip("fitz")
+    from corpus import generate_corpus
+    root = tmp_path_factory.mktemp("zip")
+    files = generate_corpus(str(root / "corpus"), docs=2, pages=2, seed=0)
+    input_dir = root / "input"
+    input_dir.mkdir()
+    zip_path = str(input_dir / "bundle.zip")
+    with zipfile.ZipFile(zip_path, "w") as zf:
+        zf.writestr("sub/", "")
+        for path in files:
+            zf.write(path, "sub/" + os.path.basename(path))
+        zf.writestr("sub/~$temp.docx", b"lock")
+        zf.writestr("__MACOSX/sub/._judgment.docx", b"resource fork")
+        zf.writestr("readme.txt", "not a judgment")
+    return files, zip_path
+
+
+def test_collect_input_files_lists_zip_members(bundle, tmp_path):
+    files, zip_path = bundle
+    members = [zip_path + core.ZIP_MEMBER_SEP + "sub/" + os.path.basename(path) for path in files]
+    assert core.collect_input_files([os.path.dirname(zip_path)]) == members
+    assert core.collect_input_files([zip_path]) == members
+
+    # 损坏的压缩包记为失败，不影响其余输入
+    bad = tmp_path / "bad.zip"
+    bad.write_bytes(b"not a zip")
+    failed = []
+    assert core.collect_input_files([str(bad), zip_path], failed) == members
+    assert [(result['path'], result['ok']) for result in failed] == [(str(bad), False)]
+    assert "BadZipFile" in failed[0]['error']
+    with pytest.raises(zipfile.BadZipFile):
+        core.collect_input_files([str(bad)])
+
+
+def test_zip_member_converts_like_extracted_file(bundle, tmp_path):
+    files, zip_path = bundle
+    for path in files:
+        member = zip_path + core.ZIP_MEMBER_SEP + "sub/" + os.path.basename(path)
+        assert core.read_zip_member(member) == open(path, "rb").read()
+        from_zip = core.convert_file(member, str(tmp_path), use_cache=False, html_in_result=True)
+        from_disk = core.convert_file(path, str(tmp_path), use_cache=False, html_in_result=True)
+        assert from_zip['html_path'] == from_disk['html_path']
+        assert from_zip['html'] == from_disk['html']
+    with pytest.raises(FileNotFoundError):
+        core.read_zip_member(zip_path + core.ZIP_MEMBER_SEP + "sub/missing.docx")
+
+
+def test_output_zip_round_trip(bundle, tmp_path):
+    """--output-zip 写出的包与逐个写出 HTML 文件的结果一致，且不留下 .part"""
+    import main02noimage
+    _, zip_path = bundle
+    out_zip = str(tmp_path / "zipped" / "html.zip")
+    assert main02noimage.batch_main([zip_path, "-o", str(tmp_path / "zipped"), "-j", "1", "--no-cache",
+                                     "--output-zip", out_zip]) == 0
+    assert main02noimage.batch_main([zip_path, "-o", str(tmp_path / "files"), "-j", "1", "--no-cache"]) == 0
+
+    expected = {name: (tmp_path / "files" / name).read_text(encoding="utf-8")
+                for name in os.listdir(tmp_path / "files") if name.endswith(".html")}
+    assert len(expected) == 4
+    with zipfile.ZipFile(out_zip) as zf:
+        assert zf.testzip() is None
+        assert {name: zf.read(name).decode("utf-8") for name in zf.namelist()} == expected
+    assert not os.path.exists(out_zip + ".part")